@@ -0,0 +1,43 @@
+"""
+JSON encode/decode helpers.
+Uses orjson when installed (much faster on multi-KB itineraries), stdlib json otherwise.
+"""
+import json
+from datetime import date, datetime, time
+from typing import Any, Callable, Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers catch this either way
+JSONDecodeError = json.JSONDecodeError
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """Parse a JSON document."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any, sort_keys: bool = False, default: Optional[Callable[[Any], Any]] = None) -> str:
+    """
+    Serialize to a compact JSON string (no whitespace, non-ASCII kept as-is).
+    Dates and times are written as ISO strings by both backends, like orjson does natively.
+    Float formatting still differs (orjson writes 1e16 and 2.5e-7, stdlib 1e+16 and 2.5e-07).
+    """
+    if orjson is not None:
+        option = orjson.OPT_SORT_KEYS if sort_keys else 0
+        return orjson.dumps(obj, default=default, option=option).decode("utf-8")
+
+    def _default(value: Any) -> Any:
+        if isinstance(value, (date, datetime, time)):
+            return value.isoformat()
+        if default is not None:
+            return default(value)
+        raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+    return json.dumps(obj, sort_keys=sort_keys, default=_default, separators=(",", ":"), ensure_ascii=False)
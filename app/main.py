@@ -1,6 +1,8 @@
 """
 FastAPI Application Entry Point.
 """
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -9,13 +11,23 @@ from pathlib import Path
 
 from .api import router
 from .config import settings
+from .services.http_client import get_http_client, close_http_client
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the shared HTTP connection pool on startup and close it on shutdown."""
+    get_http_client()
+    yield
+    await close_http_client()
 
 
 # Create FastAPI app
 app = FastAPI(
     title="Travel Planner Chatbot",
     description="AI-powered travel itinerary planner with constraint-based planning",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -1,6 +1,6 @@
 """Data models for travel planner."""
 from .form_schema import TravelForm, TRAVEL_FORM_SCHEMA
-from .itinerary import Itinerary, DayPlan, Activity
+from .itinerary import Itinerary, DayPlan, Activity, ITINERARY_JSON_SCHEMA
 from .session import Session, SessionState
 
 __all__ = [
@@ -9,6 +9,7 @@ __all__ = [
     "Itinerary",
     "DayPlan",
     "Activity",
+    "ITINERARY_JSON_SCHEMA",
     "Session",
     "SessionState",
 ]
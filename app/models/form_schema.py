@@ -2,8 +2,8 @@
 Travel Form Schema - Mandatory Form Fields (Hard Constraints).
 All fields must be filled before itinerary generation.
 """
-from pydantic import BaseModel, Field, field_validator
-from typing import Optional, Literal
+from pydantic import BaseModel, Field, PrivateAttr, field_validator
+from typing import ClassVar, Optional, Literal
 from datetime import date, time
 from enum import Enum
 
@@ -150,6 +150,32 @@ class TravelForm(BaseModel):
         description="Trip budget level"
     )
 
+    # Fields that must be filled before planning (every form field), in declaration order
+    _MANDATORY: ClassVar[tuple[str, ...]] = (
+        "trip_duration_days", "trip_duration_nights", "traveler_count", "group_type",
+        "destinations", "start_date", "end_date", "daily_start_time", "daily_end_time",
+        "weather_preference", "closed_days_restrictions", "local_guidelines",
+        "max_travel_distance_km", "sightseeing_pace", "cab_pickup_required",
+        "hotel_checkin_time", "hotel_checkout_time", "traffic_consideration",
+        "travel_mode", "budget",
+    )
+
+    # Lazily computed get_missing_fields() result, reset whenever a field is reassigned
+    # or a copy is made with updated fields
+    _missing: Optional[tuple[str, ...]] = PrivateAttr(default=None)
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in self.model_fields:
+            self._missing = None
+
+    def model_copy(self, *, update: Optional[dict] = None, deep: bool = False) -> "TravelForm":
+        """Copy the form; a copy with updated fields recomputes its missing fields."""
+        copied = super().model_copy(update=update, deep=deep)
+        if update:
+            copied._missing = None
+        return copied
+
     @field_validator('destinations', mode='before')
     @classmethod
     def validate_destinations(cls, v):
@@ -158,17 +184,16 @@ class TravelForm(BaseModel):
         return v
 
     def get_missing_fields(self) -> list[str]:
-        """Return list of field names that are still None."""
-        missing = []
-        for field_name, field_info in self.model_fields.items():
-            value = getattr(self, field_name)
-            if value is None:
-                missing.append(field_name)
-        return missing
+        """Return list of field names that are still None (cached until a field changes)."""
+        if self._missing is None:
+            self._missing = tuple(name for name in self._MANDATORY if getattr(self, name) is None)
+        return list(self._missing)
     
     def is_complete(self) -> bool:
         """Check if all mandatory fields are filled."""
-        return len(self.get_missing_fields()) == 0
+        if self._missing is None:
+            self.get_missing_fields()
+        return not self._missing
     
     def get_filled_fields(self) -> dict:
         """Return dict of fields that have values."""
@@ -187,20 +212,18 @@ class TravelForm(BaseModel):
     def merge_extracted(self, extracted: dict) -> "TravelForm":
         """Merge extracted data into form, only updating None fields."""
         current_data = self.model_dump()
-        for key, value in extracted.items():
-            if key in current_data and value is not None:
-                # Only update if current value is None
-                if current_data[key] is None:
-                    current_data[key] = value
+        # Only fill fields that are currently None; validated together with the rest below
+        current_data.update({
+            key: value for key, value in extracted.items()
+            if value is not None and key in current_data and current_data[key] is None
+        })
         return TravelForm(**current_data)
 
     def update_fields(self, updates: dict) -> "TravelForm":
         """Update fields with new values (overwriting existing)."""
         current_data = self.model_dump()
-        for key, value in updates.items():
-             # Basic validation/cleaning could happen here
-             if key in current_data:
-                 current_data[key] = value
+        # Unknown keys are ignored; the whole form is validated once below
+        current_data.update({key: value for key, value in updates.items() if key in current_data})
         return TravelForm(**current_data)
 
 
@@ -1,11 +1,13 @@
 """
 Itinerary models - Structured output for travel plans.
 """
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, PrivateAttr
+from typing import Any, Optional
 from datetime import datetime
 from enum import Enum
 
+from .. import json_codec
+
 
 class ActivityType(str, Enum):
     """Types of activities in an itinerary."""
@@ -149,10 +151,25 @@ class Itinerary(BaseModel):
         description="List of pro tips for the trip (e.g., local customs, best times to visit)"
     )
     
+    # Lazily built to_display_dict() JSON, reset whenever a field is reassigned
+    # (days/activities are not mutated in place once parsed)
+    _display_json: Optional[str] = PrivateAttr(default=None)
+    
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in self.model_fields:
+            self._display_json = None
+    
     def get_total_distance(self) -> float:
         """Get total distance for the entire trip."""
         return sum(day.total_distance_km for day in self.days)
     
+    def to_display_json(self) -> str:
+        """Display dictionary serialized as JSON, cached until the itinerary changes."""
+        if self._display_json is None:
+            self._display_json = json_codec.dumps(self.to_display_dict())
+        return self._display_json
+    
     def to_display_dict(self) -> dict:
         """Convert to display-friendly dictionary."""
         return {
@@ -187,3 +204,95 @@ class Itinerary(BaseModel):
                 for day in self.days
             ]
         }
+
+
+class RawActivity(BaseModel):
+    """An activity as emitted by the LLM, validated before anti-filler filtering."""
+    time_slot: Optional[str] = None
+    time: Optional[str] = None  # Some models emit 'time' instead of 'time_slot'
+    location: str = "Unknown"
+    activity_type: str = "sightseeing"
+    description: str = ""
+    travel_distance_km: float = 0.0
+    duration_minutes: float = 60  # LLMs sometimes emit fractional minutes
+    notes: Optional[str] = None
+
+
+class RawDayPlan(BaseModel):
+    """A day as emitted by the LLM."""
+    day_number: int = 1
+    date: str = Field(default_factory=lambda: datetime.now().strftime("%Y-%m-%d"))
+    theme: Optional[str] = None
+    activities: list[RawActivity] = Field(default_factory=list)
+    total_distance_km: float = 0.0
+    weather: Optional[str] = None
+
+
+class RawItinerary(BaseModel):
+    """The LLM itinerary response (hotel recommendations are parsed separately, one by one)."""
+    error: Any = False  # Truthy (True or a message) on the engine's fallback/unsupported-destination itinerary
+    summary: str = "Travel itinerary"
+    hotel_recommendations: list[Any] = Field(default_factory=list)  # bad entries are skipped by the planner
+    days: list[RawDayPlan] = Field(default_factory=list)
+    soft_preferences_applied: list[str] = Field(default_factory=list)
+    soft_preferences_ignored: list[str] = Field(default_factory=list)
+    changes_made: list[str] = Field(default_factory=list)
+    change_summary: str = ""
+    suggestions: list[dict] = Field(default_factory=list)
+    pro_tips: list[str] = Field(default_factory=list)
+
+
+# JSON Schema of the raw itinerary the planner asks the LLM for
+# (used for guided/structured decoding on providers that support it)
+_ACTIVITY_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "time_slot": {"type": "string"},
+        "location": {"type": "string"},
+        "activity_type": {"type": "string", "enum": [t.value for t in ActivityType]},
+        "description": {"type": "string"},
+        "travel_distance_km": {"type": "number", "minimum": 0},
+        "duration_minutes": {"type": "integer", "minimum": 0},
+        "notes": {"type": ["string", "null"]}
+    },
+    "required": ["time_slot", "location", "activity_type", "description"]
+}
+
+ITINERARY_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "summary": {"type": "string"},
+        "hotel_recommendations": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "rating": {"type": "string"},
+                    "location": {"type": "string"},
+                    "description": {"type": "string"},
+                    "price_range": {"type": ["string", "null"]}
+                },
+                "required": ["name", "rating", "location", "description"]
+            }
+        },
+        "suggestions": {"type": "array", "items": {"type": "object"}},
+        "pro_tips": {"type": "array", "items": {"type": "string"}},
+        "days": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "day_number": {"type": "integer", "minimum": 1},
+                    "date": {"type": "string"},
+                    "theme": {"type": ["string", "null"]},
+                    "weather": {"type": ["string", "null"]},
+                    "total_distance_km": {"type": "number", "minimum": 0},
+                    "activities": {"type": "array", "items": _ACTIVITY_JSON_SCHEMA}
+                },
+                "required": ["day_number", "date", "activities"]
+            }
+        }
+    },
+    "required": ["summary", "days"]
+}
@@ -1,7 +1,7 @@
 """
 Session management - Tracks conversation state and form progress.
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 from typing import Optional
 from datetime import datetime
 from enum import Enum
@@ -76,6 +76,14 @@ class Session(BaseModel):
         description="All itinerary versions"
     )
     
+    # Lazily built set mirroring soft_preferences for O(1) dedupe, reset if the list is reassigned
+    _soft_preference_set: Optional[set[str]] = PrivateAttr(default=None)
+    
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name == "soft_preferences":
+            self._soft_preference_set = None
+    
     def add_message(self, role: str, content: str) -> ChatMessage:
         """Add a message to the conversation."""
         msg = ChatMessage(role=role, content=content)
@@ -84,8 +92,11 @@ class Session(BaseModel):
         return msg
     
     def add_soft_preference(self, preference: str):
-        """Add a soft preference."""
-        if preference and preference not in self.soft_preferences:
+        """Add a soft preference (ignoring duplicates)."""
+        if self._soft_preference_set is None:
+            self._soft_preference_set = set(self.soft_preferences)
+        if preference and preference not in self._soft_preference_set:
+            self._soft_preference_set.add(preference)
             self.soft_preferences.append(preference)
             self.updated_at = datetime.now()
     
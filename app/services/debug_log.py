@@ -0,0 +1,42 @@
+"""
+Debug Log - Append-only diagnostic files (unparseable LLM output, engine errors).
+Records are queued and written by a background thread, so callers on the event loop never wait on disk.
+"""
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+# Records waiting to be written; beyond this they are dropped rather than blocking the caller
+DEBUG_LOG_QUEUE_SIZE = 1000
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """QueueHandler that discards records when the queue is full."""
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+_loggers: dict[str, logging.Logger] = {}
+
+
+def get_debug_logger(filename: str) -> logging.Logger:
+    """Logger whose records are appended to `filename` by a background writer thread."""
+    debug_logger = _loggers.get(filename)
+    if debug_logger is None:
+        records: queue.Queue = queue.Queue(maxsize=DEBUG_LOG_QUEUE_SIZE)
+        file_handler = logging.FileHandler(filename, mode="a", encoding="utf-8", delay=True)
+        listener = QueueListener(records, file_handler)
+        listener.start()
+        atexit.register(listener.stop)
+
+        debug_logger = logging.getLogger(f"{__name__}.{filename}")
+        debug_logger.setLevel(logging.DEBUG)
+        debug_logger.propagate = False
+        debug_logger.addHandler(_DroppingQueueHandler(records))
+        _loggers[filename] = debug_logger
+    return debug_logger
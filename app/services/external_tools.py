@@ -2,14 +2,74 @@
 External Tools Service.
 Handles interactions with OpenStreetMap, Foursquare, and OpenRouteService.
 """
-import httpx
 import asyncio
+from datetime import date, timedelta
 from typing import List, Dict, Optional
 import logging
+from math import radians, cos, sin, asin, sqrt
 from ..config import settings
+from .http_client import get_http_client
 
 logger = logging.getLogger(__name__)
 
+# Markers in get_recommendations output, also used to tell complete results from degraded ones
+WEATHER_NOT_REQUESTED = "Weather data not requested."
+WEATHER_UNAVAILABLE = "Weather data unavailable."
+LOCAL_DATA_HEADER = "=== VERIFIED LOCAL DATABASE DATA ==="
+LANDMARKS_HEADER = "ADDITIONAL LANDMARKS:"
+# Open-Meteo only forecasts this many days ahead; later trips never get weather
+WEATHER_FORECAST_DAYS = 16
+
+# Nominatim usage policy: at most about one request per second from the whole app
+OSM_MIN_INTERVAL = 1.1
+
+
+class _RequestSpacer:
+    """
+    Spaces request starts at least `interval` seconds apart across all concurrent
+    callers (e.g. the concurrent coordinate lookups of one itinerary).
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._next_at = 0.0
+
+    async def wait(self):
+        """Wait for this caller's slot."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+            self._next_at = 0.0
+        async with self._lock:
+            delay = self._next_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_at = loop.time() + self.interval
+
+
+_osm_spacer = _RequestSpacer(OSM_MIN_INTERVAL)
+
+
+def _haversine(lon1, lat1, lon2, lat2):
+    """
+    Calculate the great circle distance in kilometers between two points 
+    on the earth (specified in decimal degrees)
+    """
+    # convert decimal degrees to radians 
+    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
+
+    # haversine formula 
+    dlon = lon2 - lon1 
+    dlat = lat2 - lat1 
+    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
+    c = 2 * asin(sqrt(a)) 
+    r = 6371 # Radius of earth in kilometers. Use 3956 for miles. Determines return value units.
+    return c * r
+
+
 class ExternalToolsService:
     """Service to interact with external APIs."""
     
@@ -38,14 +98,15 @@ class ExternalToolsService:
         # Nominatim requires a user-agent
         headers = {"User-Agent": "TravelPlannerApp/1.0"}
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(url, params=params, headers=headers)
-                response.raise_for_status()
-                return response.json()
-            except Exception as e:
-                logger.error(f"OSM Error: {e}")
-                return []
+        client = get_http_client()
+        try:
+            await _osm_spacer.wait()
+            response = await client.get(url, params=params, headers=headers)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            logger.error(f"OSM Error: {e}")
+            return []
 
     async def get_foursquare_food(self, near: str, query: str = "food", limit: int = 5) -> List[Dict]:
         """
@@ -63,23 +124,23 @@ class ExternalToolsService:
             "sort": "RATING"
         }
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(url, headers=self.headers_fs, params=params)
-                response.raise_for_status()
-                data = response.json()
-                results = []
-                for place in data.get("results", []):
-                    results.append({
-                        "name": place.get("name"),
-                        "location": place.get("location", {}).get("formatted_address"),
-                        "categories": [c["name"] for c in place.get("categories", [])],
-                        "distance": place.get("distance")
-                    })
-                return results
-            except Exception as e:
-                logger.error(f"Foursquare Error: {e}")
-                return []
+        client = get_http_client()
+        try:
+            response = await client.get(url, headers=self.headers_fs, params=params)
+            response.raise_for_status()
+            data = response.json()
+            results = []
+            for place in data.get("results", []):
+                results.append({
+                    "name": place.get("name"),
+                    "location": place.get("location", {}).get("formatted_address"),
+                    "categories": [c["name"] for c in place.get("categories", [])],
+                    "distance": place.get("distance")
+                })
+            return results
+        except Exception as e:
+            logger.error(f"Foursquare Error: {e}")
+            return []
 
     async def get_ors_distancematrix(self, locations: List[List[float]]) -> Dict:
         """
@@ -93,14 +154,14 @@ class ExternalToolsService:
         url = "https://api.openrouteservice.org/v2/matrix/driving-car"
         payload = {"locations": locations, "metrics": ["distance", "duration"]}
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(url, json=payload, headers=self.headers_ors)
-                response.raise_for_status()
-                return response.json()
-            except Exception as e:
-                logger.error(f"ORS Error: {e}")
-                return {}
+        client = get_http_client()
+        try:
+            response = await client.post(url, json=payload, headers=self.headers_ors)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            logger.error(f"ORS Error: {e}")
+            return {}
 
     async def get_weather_forecast(self, lat: float, lon: float, start_date: str, end_date: str) -> str:
         """
@@ -116,34 +177,34 @@ class ExternalToolsService:
             "end_date": end_date
         }
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(url, params=params)
-                response.raise_for_status()
-                data = response.json()
-                
-                daily = data.get("daily", {})
-                dates = daily.get("time", [])
-                max_temps = daily.get("temperature_2m_max", [])
-                min_temps = daily.get("temperature_2m_min", [])
-                codes = daily.get("weather_code", [])
-                
-                weather_summary = []
-                for i in range(len(dates)):
-                    code = codes[i]
-                    # Simple weather code mapping
-                    condition = "Clear"
-                    if code > 0: condition = "Cloudy"
-                    if code >= 51: condition = "Rainy"
-                    if code >= 71: condition = "Snowy"
-                    if code >= 95: condition = "Stormy"
-                    
-                    weather_summary.append(f"{dates[i]}: {condition} ({min_temps[i]}°C to {max_temps[i]}°C)")
+        client = get_http_client()
+        try:
+            response = await client.get(url, params=params)
+            response.raise_for_status()
+            data = response.json()
+            
+            daily = data.get("daily", {})
+            dates = daily.get("time", [])
+            max_temps = daily.get("temperature_2m_max", [])
+            min_temps = daily.get("temperature_2m_min", [])
+            codes = daily.get("weather_code", [])
+            
+            weather_summary = []
+            for i in range(len(dates)):
+                code = codes[i]
+                # Simple weather code mapping
+                condition = "Clear"
+                if code > 0: condition = "Cloudy"
+                if code >= 51: condition = "Rainy"
+                if code >= 71: condition = "Snowy"
+                if code >= 95: condition = "Stormy"
                 
-                return "\n".join(weather_summary)
-            except Exception as e:
-                logger.error(f"Weather API Error: {e}")
-                return "Weather data unavailable."
+                weather_summary.append(f"{dates[i]}: {condition} ({min_temps[i]}°C to {max_temps[i]}°C)")
+            
+            return "\n".join(weather_summary)
+        except Exception as e:
+            logger.error(f"Weather API Error: {e}")
+            return WEATHER_UNAVAILABLE
 
     async def get_coordinates(self, place_name: str) -> Optional[List[float]]:
         """
@@ -161,78 +222,76 @@ class ExternalToolsService:
                 pass
         return None
 
-    async def update_itinerary_distances(self, itinerary: Dict) -> Dict:
+    async def _resolve_coordinates(self, location_name: str) -> Optional[List[float]]:
         """
-        Update travel distances in the itinerary using Local DB coordinates and Haversine formula.
+        Get [lon, lat] for an itinerary location: Local DB first, then OSM.
         """
-        from math import radians, cos, sin, asin, sqrt
         from .local_database import local_db
 
-        def haversine(lon1, lat1, lon2, lat2):
-            """
-            Calculate the great circle distance in kilometers between two points 
-            on the earth (specified in decimal degrees)
-            """
-            # convert decimal degrees to radians 
-            lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
-
-            # haversine formula 
-            dlon = lon2 - lon1 
-            dlat = lat2 - lat1 
-            a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-            c = 2 * asin(sqrt(a)) 
-            r = 6371 # Radius of earth in kilometers. Use 3956 for miles. Determines return value units.
-            return c * r
-
-        # 1. Get City Center Coordinates (as starting point for first day)
-        # We assume the main destination is available or we pick the first activty
+        # Check Local DB (sqlite, off the event loop so lookups overlap)
+        local_coords = await asyncio.to_thread(local_db.get_coordinates, location_name)
+        if local_coords:
+            return local_coords
+        # Fallback to OSM (cached/live)
+        return await self.get_coordinates(location_name)
+
+    async def _resolve_all_coordinates(self, days: List[Dict]) -> Dict[str, Optional[List[float]]]:
+        """
+        Resolve every distinct activity location once, all lookups in flight together
+        (instead of awaiting each activity's geocoding in turn). Local DB lookups run
+        concurrently; OSM fallbacks are spaced by the shared Nominatim rate limit.
+        """
+        names = list(dict.fromkeys(
+            activity.get("location")
+            for day in days
+            for activity in day.get("activities", [])
+        ))
+        resolved = await asyncio.gather(*(self._resolve_coordinates(name) for name in names))
+        return dict(zip(names, resolved))
+
+    @staticmethod
+    def _apply_day_distances(day: Dict, coords_by_name: Dict[str, Optional[List[float]]]):
+        """
+        Set each activity's distance from the previous one (Haversine) and the day total.
+        """
+        # Ensure total_distance_km exists
+        if "total_distance_km" not in day:
+            day["total_distance_km"] = 0.0
+            
+        # Previous location coordinates (start empty)
+        prev_coords = None
         
-        for day in itinerary.get("days", []):
-            # Ensure total_distance_km exists
-            if "total_distance_km" not in day:
-                day["total_distance_km"] = 0.0
-                
-            activities = day.get("activities", [])
-            if not activities:
-                continue
-                
-            # Previous location coordinates (start empty)
-            prev_coords = None
+        # Complexity: effectively we just want distance between sequential activities.
+        for activity in day.get("activities", []):
+            current_coords = coords_by_name.get(activity.get("location"))
             
-            # If we have a city in the itinerary summary or context, we could look it up.
-            # For now, let's assume the first activity starts from "somewhere" (maybe hotel).
-            # If the user provides a "Hotel" in hotel_recommendations, we could use that as start?
-            # Complexity: effectively we just want distance between sequential activities.
+            if prev_coords and current_coords:
+                dist = _haversine(prev_coords[0], prev_coords[1], current_coords[0], current_coords[1])
+                activity["travel_distance_km"] = round(dist, 2)
+                day["total_distance_km"] += round(dist, 2)
+            else:
+                # First activity or missing coords
+                activity["travel_distance_km"] = 0.0
             
-            for i, activity in enumerate(activities):
-                location_name = activity.get("location")
-                current_coords = None
-                
-                # Check Local DB
-                local_coords = local_db.get_coordinates(location_name)
-                
-                if local_coords:
-                    current_coords = local_coords
-                else:
-                    # Fallback to OSM (cached/live)
-                    # For performance, maybe skip live OSM for now or use the get_coordinates method
-                    # which uses OSM.
-                    current_coords = await self.get_coordinates(location_name)
-                
-                if prev_coords and current_coords:
-                    dist = haversine(prev_coords[0], prev_coords[1], current_coords[0], current_coords[1])
-                    activity["travel_distance_km"] = round(dist, 2)
-                    day["total_distance_km"] += round(dist, 2)
-                else:
-                     # First activity or missing coords
-                     activity["travel_distance_km"] = 0.0 # Or keep what LLM guessed if we trust it?
-                     # Let's keep LLM guess if we fail to calc
-                     if activity.get("travel_distance_km") == 0:
-                         pass
-                
-                if current_coords:
-                    prev_coords = current_coords
-                    
+            if current_coords:
+                prev_coords = current_coords
+
+    async def update_day_distances(self, day: Dict) -> Dict:
+        """
+        Update travel distances for a single day (e.g. as soon as it is streamed).
+        """
+        coords_by_name = await self._resolve_all_coordinates([day])
+        self._apply_day_distances(day, coords_by_name)
+        return day
+
+    async def update_itinerary_distances(self, itinerary: Dict) -> Dict:
+        """
+        Update travel distances in the itinerary using Local DB coordinates and Haversine formula.
+        """
+        days = itinerary.get("days", [])
+        coords_by_name = await self._resolve_all_coordinates(days)
+        for day in days:
+            self._apply_day_distances(day, coords_by_name)
         return itinerary
 
 
@@ -241,7 +300,7 @@ class ExternalToolsService:
         Fetch real-world hotels, restaurants, and weather forecast from Local DB and External APIs.
         """
         # 0. Fetch Weather if dates available
-        weather_info = "Weather data not requested."
+        weather_info = WEATHER_NOT_REQUESTED
         if start_date and end_date:
             coords = await self.get_coordinates(destination)
             if coords:
@@ -255,7 +314,7 @@ class ExternalToolsService:
         local_data_found = False
         
         try:
-            city_status = local_db.get_city_status(destination)
+            city_status = await local_db.aget_city_status(destination)
             if city_status['found']:
                 official_name = city_status['official_name']
                 logger.info(f"Local data found for {official_name}")
@@ -267,7 +326,7 @@ class ExternalToolsService:
                 
                 if local_hotels or local_food or local_areas:
                     local_data_found = True
-                    context += "=== VERIFIED LOCAL DATABASE DATA ===\n"
+                    context += f"{LOCAL_DATA_HEADER}\n"
                     
                     if local_areas:
                         context += "MAJOR AREAS & ATTRACTIONS:\n"
@@ -303,30 +362,26 @@ class ExternalToolsService:
         }
         terms = budget_map.get(budget.lower(), budget_map["standard"])
         
-        # Sequential searches for a holistic city profile
+        # Sequential searches for a holistic city profile (get_osm_places spaces them per Nominatim policy)
         # Track specifically for malls/modern spots vs cultural/historic
         top_spots = await self.get_osm_places(f"famous landmarks and top sights in {destination}", limit=10)
-        await asyncio.sleep(1.1)
         
         # Only fetch these if local data was sparse or missing
         if not local_data_found or len(local_areas if 'local_areas' in locals() else []) < 3:
              malls = await self.get_osm_places(f"large shopping malls and commercial centers in {destination}", limit=8)
-             await asyncio.sleep(1.1)
              culture = await self.get_osm_places(f"famous temples and historical museums in {destination}", limit=10)
              all_pois = top_spots + culture + malls
         else:
             all_pois = top_spots # Just get top spots to augment local areas
 
         
-        await asyncio.sleep(1.1)
         hotels = await self.get_osm_places(f"{terms['hotel']} in {destination}", limit=5)
-        await asyncio.sleep(1.1)
         restaurants = await self.get_osm_places(f"{terms['food']} or top rated dining in {destination}", limit=5)
         
         context += "=== SUPPLEMENTARY WEB DATA ===\n"
         
         if all_pois:
-            context += "ADDITIONAL LANDMARKS:\n"
+            context += f"{LANDMARKS_HEADER}\n"
             seen = set()
             count = 0
             for p in all_pois:
@@ -350,5 +405,21 @@ class ExternalToolsService:
                 
         return context
 
+    @staticmethod
+    def is_degraded_context(context: str, start_date: str = None, end_date: str = None) -> bool:
+        """
+        Whether a get_recommendations result is missing data because lookups failed:
+        no places at all, or no weather for a dated trip starting within the forecast
+        window (past trips and trips further out never get weather).
+        """
+        if LOCAL_DATA_HEADER not in context and LANDMARKS_HEADER not in context:
+            return True
+        if not (start_date and end_date):
+            return False
+        today = date.today()
+        if today <= date.fromisoformat(start_date) <= today + timedelta(days=WEATHER_FORECAST_DAYS):
+            return WEATHER_UNAVAILABLE in context or WEATHER_NOT_REQUESTED in context
+        return False
+
 # Global instance
 external_tools = ExternalToolsService()
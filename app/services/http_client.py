@@ -0,0 +1,44 @@
+"""
+HTTP Client - One pooled httpx.AsyncClient shared by external_tools and the LLM engine.
+Reusing keep-alive connections skips a TCP + TLS handshake on every API call, and with
+HTTP/2 (needs the h2 package) concurrent requests to one host share a single connection.
+"""
+from typing import Optional
+
+import httpx
+
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+
+# Connection pool sizing for the shared client
+HTTP_MAX_CONNECTIONS = 200
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 100
+HTTP_KEEPALIVE_EXPIRY = 300.0
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get or create the process-wide HTTP client."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=h2 is not None,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+            )
+        )
+    return _client
+
+
+async def close_http_client():
+    """Close the shared client and its pooled connections (app shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,112 @@
+"""
+JSON Stream - Incremental extraction of array items from streamed LLM JSON.
+Lets callers act on each completed item (e.g. an itinerary day) before the reply ends.
+"""
+import json
+import re
+from typing import Any, Optional
+
+from .. import json_codec
+
+
+# Structural tokens: escapes (a lone trailing backslash means the escape continues in the
+# next delta), quotes and brackets. Everything else is skipped by the regex engine.
+_TOKEN_RE = re.compile(r'\\.?|["{}\[\]]', re.DOTALL)
+
+
+class JsonArrayStream:
+    """
+    Feed text deltas of a JSON document; get back the items of the array stored
+    under the top-level `key` as soon as each one is complete. The full text stays
+    available in `text` for parsing the rest of the document once the stream ends.
+
+    Each delta is scanned once for structural tokens while tracking bracket depth;
+    an item is decoded only when its closing bracket brings the depth back to the
+    array level, so the total work stays linear in the reply length.
+    """
+
+    def __init__(self, key: str):
+        self.done = False
+        self._key = key
+        self._chunks: list[str] = []
+        self._text: Optional[str] = ""
+        self._depth = 0
+        self._in_string = False
+        self._escape_pending = False
+        # Top-level string being read (candidate key) and the last one completed
+        self._string_parts: Optional[list[str]] = None
+        self._last_string: Optional[str] = None
+        # Depth inside the target array (None until found) and the current item's text
+        self._array_depth: Optional[int] = None
+        self._item_parts: Optional[list[str]] = None
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        if self._text is None:
+            self._text = "".join(self._chunks)
+        return self._text
+
+    def feed(self, delta: str) -> list[Any]:
+        """Append a delta and return the array items completed by it."""
+        self._chunks.append(delta)
+        self._text = None
+        items = []
+
+        start = 0
+        if self._escape_pending:
+            # First character completes an escape split across deltas
+            self._escape_pending = False
+            start = 1
+        item_start = 0
+        string_start = 0
+
+        for match in _TOKEN_RE.finditer(delta, start):
+            token = match.group()
+            if token[0] == "\\":
+                if len(token) == 1:
+                    self._escape_pending = True
+                continue
+            pos = match.start()
+
+            if token == '"':
+                self._in_string = not self._in_string
+                if self._depth == 1:
+                    if self._in_string:
+                        self._string_parts = []
+                        string_start = pos + 1
+                    elif self._string_parts is not None:
+                        self._string_parts.append(delta[string_start:pos])
+                        self._last_string = "".join(self._string_parts)
+                        self._string_parts = None
+                continue
+            if self._in_string:
+                continue
+
+            if token in "{[":
+                self._depth += 1
+                if self._array_depth is None:
+                    if token == "[" and self._depth == 2 and self._last_string == self._key:
+                        self._array_depth = self._depth
+                elif not self.done and self._depth == self._array_depth + 1:
+                    self._item_parts = []
+                    item_start = pos
+            else:
+                if self._item_parts is not None and self._depth == self._array_depth + 1:
+                    # Item closed: decode just its own text
+                    self._item_parts.append(delta[item_start:pos + 1])
+                    try:
+                        items.append(json_codec.loads("".join(self._item_parts)))
+                    except json.JSONDecodeError:
+                        pass
+                    self._item_parts = None
+                elif self._array_depth is not None and self._depth == self._array_depth:
+                    self.done = True
+                self._depth -= 1
+
+        # Carry partial key / item text over to the next delta
+        if self._string_parts is not None:
+            self._string_parts.append(delta[string_start:])
+        if self._item_parts is not None:
+            self._item_parts.append(delta[item_start:])
+        return items
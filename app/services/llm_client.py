@@ -2,11 +2,23 @@
 LLM Client - Unified interface for multiple LLM providers.
 Supports OpenAI, Mistral, OpenRouter, and Ollama.
 """
-from typing import Optional
+from typing import Optional, AsyncIterator, TypeVar
+from functools import lru_cache
+import asyncio
 import json
 import re
 
+from pydantic import BaseModel, ValidationError
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
 from ..config import get_llm_config
+from .. import json_codec
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
 
 
 class LLMClient:
@@ -27,6 +39,15 @@ class LLMClient:
             from .real_llm import RealLLMClient
             self._engine = RealLLMClient()
             print(f"INFO: Using Real LLM Engine ({self.provider})")
+        self._warm_up_task: Optional[asyncio.Task] = None
+    
+    def warm_up(self):
+        """
+        Open the provider connection in the background (once per process), so the
+        first real request doesn't pay the TCP + TLS handshake.
+        """
+        if self._warm_up_task is None and hasattr(self._engine, "warm_up"):
+            self._warm_up_task = asyncio.create_task(self._engine.warm_up())
     
     async def chat(
         self,
@@ -40,16 +61,104 @@ class LLMClient:
         """
         return await self._engine.chat(messages, temperature, max_tokens, json_mode)
     
+    async def chat_batch(
+        self,
+        batch: list[list[dict]],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None
+    ) -> list[str]:
+        """
+        Process several independent chats concurrently.
+        Results are returned in the same order as the input conversations.
+        """
+        return await asyncio.gather(*[
+            self._engine.chat(messages, temperature, max_tokens)
+            for messages in batch
+        ])
+    
     async def chat_json(
         self,
         messages: list[dict],
         temperature: Optional[float] = None,
-        max_tokens: Optional[int] = None
+        max_tokens: Optional[int] = None,
+        schema: Optional[dict] = None
     ) -> dict:
         """
         Process JSON request using the grounded engine.
+        When a JSON schema is given, engines that support guided decoding enforce it while sampling.
+        """
+        return await self._engine.chat_json(messages, temperature, max_tokens, schema)
+    
+    async def chat_model(
+        self,
+        messages: list[dict],
+        response_model: type[ModelT],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        schema: Optional[dict] = None,
+        max_retries: int = 2
+    ) -> ModelT:
+        """
+        Process JSON request and validate it into response_model.
+        Output that fails validation is sent back with the validation errors so the
+        model can correct it, up to max_retries times. Replies the engine itself marked
+        as an error are not retried.
+        """
+        schema = schema or response_model.model_json_schema()
+        messages = list(messages)
+        for attempt in range(max_retries + 1):
+            data = await self._engine.chat_json(messages, temperature, max_tokens, schema)
+            try:
+                return response_model.model_validate(data)
+            except ValidationError as e:
+                if attempt == max_retries or (isinstance(data, dict) and data.get("error")):
+                    raise
+                messages += [
+                    {"role": "assistant", "content": json_codec.dumps(data, default=str)},
+                    {"role": "user", "content": f"That JSON does not match the required schema:\n{e}\nReturn the corrected JSON only."}
+                ]
+
+    
+    def parse_json(self, text: str) -> dict:
+        """
+        Parse a raw JSON reply (e.g. an accumulated stream) using the engine's repair steps:
+        code fences, smart quotes, trailing commas and truncated output.
+        """
+        return self._engine.parse_json(text)
+    
+    async def chat_json_stream(
+        self,
+        messages: list[dict],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        schema: Optional[dict] = None,
+        stream_info: Optional[dict] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a JSON reply as raw text deltas (parse incrementally with json_stream).
+        If given, stream_info receives the reply's finish_reason once the stream ends.
         """
-        return await self._engine.chat_json(messages, temperature, max_tokens)
+        async for delta in self._engine.chat_stream(messages, temperature, max_tokens, json_mode=True, schema=schema, stream_info=stream_info):
+            yield delta
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    """Load the tokenizer once per process (None if tiktoken or its data is unavailable)."""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")  # gpt-4o family
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Approximate prompt token count; falls back to ~4 characters per token without tiktoken."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
 
 
 # Global LLM client instance
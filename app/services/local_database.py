@@ -3,25 +3,40 @@ Local Database Service.
 Handles interactions with local SQLite datasets for trusted travel data.
 """
 import sqlite3
+import asyncio
 import logging
 import os
+from pathlib import Path
 from typing import List, Dict, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
 import re
 
+_LATIN_RE = re.compile(r'[a-zA-Z]')
+_ALPHA_RE = re.compile(r'[^\s\d\W]', re.UNICODE)
+
 def _is_latin_text(text: str) -> bool:
     """Check if text is primarily Latin script (English). Rejects Arabic, Cyrillic, CJK, etc."""
     if not text:
         return False
     # Count Latin characters vs total alphabetic characters
-    latin_chars = len(re.findall(r'[a-zA-Z]', text))
-    total_alpha = len(re.findall(r'[^\s\d\W]', text, re.UNICODE))
+    if text.isascii():
+        # ASCII fast path: the only non-Latin "alphabetic" char the regex admits is '_'
+        latin_chars = sum(map(str.isalpha, text))
+        total_alpha = latin_chars + text.count('_')
+    else:
+        latin_chars = len(_LATIN_RE.findall(text))
+        total_alpha = len(_ALPHA_RE.findall(text))
     if total_alpha == 0:
         return False
     return (latin_chars / total_alpha) > 0.5
 
+# Exact city lookups compare lower(name) (the cities tables are small, a scan is cheap);
+# LIKE is only used for prefix fallback
+_CITY_EXACT_QUERY = "SELECT name FROM cities WHERE lower(name) = ? LIMIT 1"
+_CITY_PREFIX_QUERY = "SELECT name FROM cities WHERE name LIKE ? LIMIT 1"
+
 class LocalDatabaseService:
     """Service to interact with local hospitality databases."""
     
@@ -40,26 +55,28 @@ class LocalDatabaseService:
             logger.warning(f"International DB not found at {self.db_intl}")
 
     def _get_connection(self, db_path: str) -> Optional[sqlite3.Connection]:
-        """Create a database connection."""
+        """Create a read-only database connection (the shipped datasets are never modified)."""
         try:
             if os.path.exists(db_path):
-                conn = sqlite3.connect(db_path)
+                conn = sqlite3.connect(f"{Path(db_path).as_uri()}?mode=ro", uri=True)
                 conn.row_factory = sqlite3.Row
                 return conn
         except Exception as e:
             logger.error(f"Error connecting to DB {db_path}: {e}")
         return None
 
-    def _query_db(self, db_path: str, query: str, args: Tuple = ()) -> List[Dict]:
-        """Execute a query against a specific database."""
+    def _query_db(self, db_path: str, query: str, args: Tuple = ()) -> List[sqlite3.Row]:
+        """
+        Execute a query against a specific database.
+        Rows are returned as sqlite3.Row; public getters convert to dict only what they return.
+        """
         conn = self._get_connection(db_path)
         if not conn:
             return []
         
         try:
             cursor = conn.execute(query, args)
-            rows = cursor.fetchall()
-            return [dict(row) for row in rows]
+            return cursor.fetchall()
         except Exception as e:
             logger.error(f"Query error in {db_path}: {e}")
             return []
@@ -67,23 +84,52 @@ class LocalDatabaseService:
             if conn:
                 conn.close()
 
+    async def _aquery_db(self, db_path: str, query: str, args: Tuple = ()) -> List[sqlite3.Row]:
+        """Run _query_db on a worker thread so independent queries can overlap."""
+        return await asyncio.to_thread(self._query_db, db_path, query, args)
+
+    @staticmethod
+    def _build_city_status(domestic_res: List[sqlite3.Row], intl_res: List[sqlite3.Row]) -> Dict[str, bool]:
+        """Combine city lookup rows from both databases into a status dict."""
+        return {
+            "found": bool(domestic_res or intl_res),
+            "is_domestic": bool(domestic_res),
+            "is_intl": bool(intl_res),
+            "official_name": (domestic_res[0]['name'] if domestic_res else (intl_res[0]['name'] if intl_res else None))
+        }
+
     def get_city_status(self, city_name: str) -> Dict[str, bool]:
         """
         Check if a city exists in either database.
         Returns: {'found': bool, 'is_domestic': bool, 'is_intl': bool}
         """
-        query = "SELECT name FROM cities WHERE name LIKE ? LIMIT 1"
-        args = (f"{city_name}%",) # Flexible matching
+        args = (city_name.lower(),)
+        domestic_res = self._query_db(self.db_domestic, _CITY_EXACT_QUERY, args)
+        intl_res = self._query_db(self.db_intl, _CITY_EXACT_QUERY, args)
         
-        domestic_res = self._query_db(self.db_domestic, query, args)
-        intl_res = self._query_db(self.db_intl, query, args)
+        if not (domestic_res or intl_res):
+            args = (f"{city_name}%",) # Flexible matching
+            domestic_res = self._query_db(self.db_domestic, _CITY_PREFIX_QUERY, args)
+            intl_res = self._query_db(self.db_intl, _CITY_PREFIX_QUERY, args)
         
-        return {
-            "found": bool(domestic_res or intl_res),
-            "is_domestic": bool(domestic_res),
-            "is_intl": bool(intl_res),
-            "official_name": (domestic_res[0]['name'] if domestic_res else (intl_res[0]['name'] if intl_res else None))
-        }
+        return self._build_city_status(domestic_res, intl_res)
+
+    async def aget_city_status(self, city_name: str) -> Dict[str, bool]:
+        """Async variant of get_city_status that queries both databases concurrently."""
+        args = (city_name.lower(),)
+        domestic_res, intl_res = await asyncio.gather(
+            self._aquery_db(self.db_domestic, _CITY_EXACT_QUERY, args),
+            self._aquery_db(self.db_intl, _CITY_EXACT_QUERY, args)
+        )
+        
+        if not (domestic_res or intl_res):
+            args = (f"{city_name}%",) # Flexible matching
+            domestic_res, intl_res = await asyncio.gather(
+                self._aquery_db(self.db_domestic, _CITY_PREFIX_QUERY, args),
+                self._aquery_db(self.db_intl, _CITY_PREFIX_QUERY, args)
+            )
+        
+        return self._build_city_status(domestic_res, intl_res)
 
     def get_hotels(self, city_name: str, budget: str = "standard") -> List[Dict]:
         """Fetch hotels for a city from local DBs."""
@@ -103,7 +149,7 @@ class LocalDatabaseService:
         # Basic client-side filtering
         final_results = []
         for r in results:
-            name = r.get('name', '')
+            name = r['name'] or ''
             
             # Skip non-Latin names (Arabic, Cyrillic, etc.)
             if not _is_latin_text(name):
@@ -113,7 +159,7 @@ class LocalDatabaseService:
             if any(x in name.lower() for x in ['sweet', 'store', 'shop']):
                 continue
                 
-            final_results.append(r)
+            final_results.append(dict(r))
             
         return final_results
 
@@ -133,7 +179,7 @@ class LocalDatabaseService:
             results.extend(self._query_db(self.db_intl, query, (target_name,)))
         
         # Filter out non-Latin names
-        return [r for r in results if _is_latin_text(r.get('name', ''))]
+        return [dict(r) for r in results if _is_latin_text(r['name'] or '')]
 
     def get_areas(self, city_name: str) -> List[Dict]:
         """Fetch areas/attractions for a city."""
@@ -153,9 +199,9 @@ class LocalDatabaseService:
         # Refined Filtering: Remove boring residential areas AND non-Latin names
         filtered = []
         for r in results:
-            name = r.get('name', '')
-            t = r.get('type', '').lower()
-            tags = r.get('tags', '').lower()
+            name = r['name'] or ''
+            t = (r['type'] or '').lower()
+            tags = (r['tags'] or '').lower()
             
             # Skip non-Latin names (Arabic, Cyrillic, etc.)
             if not _is_latin_text(name):
@@ -170,13 +216,13 @@ class LocalDatabaseService:
             is_boring = t in ['neighbourhood', 'suburb', 'residential', 'locality']
             
             if is_interesting or has_good_tags or not is_boring:
-                filtered.append(r)
+                filtered.append(dict(r))
         
         # Fallback: If we filtered everything out, 
         # return top 5 Latin-named results so the LLM has SOMETHING to work with.
         if not filtered and results:
-             latin_results = [r for r in results if _is_latin_text(r.get('name', ''))]
-             return latin_results[:5] if latin_results else results[:5]
+             latin_results = [r for r in results if _is_latin_text(r['name'] or '')]
+             return [dict(r) for r in (latin_results[:5] if latin_results else results[:5])]
                 
         return filtered
 
@@ -206,10 +252,10 @@ class LocalDatabaseService:
         # Try finding in areas (if they had lat/lon, but schema didn't show it. 
         # Assuming cities table has it for the city center)
         # Check if it is a city name
-        query_city = "SELECT lat, lon FROM cities WHERE name LIKE ? LIMIT 1"
-        res = self._query_db(self.db_domestic, query_city, (f"{place_name}",))
+        query_city = "SELECT lat, lon FROM cities WHERE lower(name) = ? LIMIT 1"
+        res = self._query_db(self.db_domestic, query_city, (place_name.lower(),))
         if not res:
-            res = self._query_db(self.db_intl, query_city, (f"{place_name}",))
+            res = self._query_db(self.db_intl, query_city, (place_name.lower(),))
             
         if res:
             return [res[0]['lon'], res[0]['lat']]
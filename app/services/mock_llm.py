@@ -6,13 +6,22 @@ No live APIs, no invented places.
 import re
 import json
 import os
+import random
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator
 from datetime import datetime, timedelta
 
+from .. import json_codec
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
+
+def _fmt_minutes(minutes: int) -> str:
+    """Format minutes since midnight as HH:MM (wrapping past midnight)."""
+    return f"{(minutes // 60) % 24:02d}:{minutes % 60:02d}"
+
+
 class MockLLMClient:
     """
     Grounded Mock LLM Client.
@@ -26,6 +35,8 @@ class MockLLMClient:
         self.rules = self._load_json("rules.json")
         self.destinations_map = self._load_json("destinations.json")
         self.user_agent = "TravelPlannerBot/1.0 (admin@example.com)"
+        # Flattened (name, type, desc) POI records per city; resource data never changes at runtime
+        self._poi_pool_cache: Dict[str, tuple] = {}
 
     def _load_json(self, filename: str) -> Dict[str, Any]:
         """Utility to load a JSON resource file."""
@@ -44,6 +55,21 @@ class MockLLMClient:
         clean_name = city_name.lower().replace(" ", "_").replace("-", "_")
         return self._load_json(f"{clean_name}.json")
 
+    def _get_poi_pool(self, city_name: str) -> Optional[tuple]:
+        """Return the cached (name, type, desc) POI records for a city, or None if its data file is missing."""
+        pool = self._poi_pool_cache.get(city_name)
+        if pool is None:
+            city_res = self._get_city_resource(city_name)
+            if not city_res:
+                return None
+            pool = tuple(
+                (item["name"], cat, item["description"])
+                for cat, items in city_res.get("categories", {}).items()
+                for item in items
+            )
+            self._poi_pool_cache[city_name] = pool
+        return pool
+
     async def chat(
         self,
         messages: list[dict],
@@ -53,7 +79,8 @@ class MockLLMClient:
     ) -> str:
         """Process chat grounding it in resource data."""
         user_msg = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
-        system_msg = next((m["content"] for m in messages if m["role"] == "system"), "")
+        # Q&A shares the planner's first system message, so route on all of them
+        system_msg = "\n".join(m["content"] for m in messages if m["role"] == "system")
         
         # Check if this is a Q&A request (Helpful Travel Assistant)
         if "helpful travel assistant" in system_msg.lower():
@@ -81,19 +108,38 @@ class MockLLMClient:
         
         return "I am grounded in backend data. Please ask about itineraries for supported cities."
 
+    async def chat_stream(
+        self,
+        messages: list[dict],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        json_mode: bool = False,
+        schema: Optional[dict] = None,
+        stream_info: Optional[dict] = None
+    ) -> AsyncIterator[str]:
+        """Stream interface for parity with the real engine; the grounded reply arrives in one piece."""
+        yield await self.chat(messages, temperature, max_tokens, json_mode)
+        if stream_info is not None:
+            stream_info["finish_reason"] = "stop"
+
     async def chat_json(
         self,
         messages: list[dict],
         temperature: Optional[float] = None,
-        max_tokens: Optional[int] = None
+        max_tokens: Optional[int] = None,
+        schema: Optional[dict] = None
     ) -> dict:
-        """Return parsed JSON response."""
+        """Return parsed JSON response (output is already schema-shaped, so schema is ignored)."""
         response = await self.chat(messages, temperature, max_tokens, json_mode=True)
         try:
-            return json.loads(response)
+            return json_codec.loads(response)
         except:
             return {"summary": "Error generating grounded JSON.", "days": []}
 
+    def parse_json(self, text: str) -> dict:
+        """Parse a raw JSON reply (grounded output is already clean JSON)."""
+        return json_codec.loads(text)
+
     def _generate_grounded_itinerary(self, prompt: str) -> str:
         """Generate itinerary using ONLY grounded JSON files."""
         # 1. Extract Info (Grounded Destinations)
@@ -118,8 +164,8 @@ class MockLLMClient:
             })
 
         # 2. Load Resource
-        city_res = self._get_city_resource(city_match)
-        if not city_res:
+        poi_pool = self._get_poi_pool(city_match)
+        if poi_pool is None:
             return json.dumps({"summary": f"Data file for {city_match} is missing.", "days": []})
 
         # 3. Apply Rules
@@ -131,37 +177,33 @@ class MockLLMClient:
         max_acts = pace_rule.get("max_activities_per_day", 4)
         
         # 4. Generate Days
-        poi_pool = []
-        for cat, items in city_res.get("categories", {}).items():
-            for item in items:
-                poi_pool.append({"name": item["name"], "type": cat, "desc": item["description"]})
-        
-        import random
-        random.seed(city_match + str(days)) # Deterministic for city/duration
+        # Private generator: deterministic for city/duration without touching global state
+        rng = random.Random(city_match + str(days))
         
         itinerary_days = []
         start_date = datetime.now()
+        duration = pace_rule.get("min_duration_minutes", 60)
+        gap = pace_rule.get("gap_between_activities_minutes", 30)
         
         for d in range(1, days + 1):
             # Select unique POIs for this day if possible
             sample_size = min(max_acts, len(poi_pool))
-            day_pois = random.sample(poi_pool, sample_size)
+            day_pois = rng.sample(poi_pool, sample_size)
             
             activities = []
-            curr_time = datetime.strptime("09:00", "%H:%M")
+            curr = 9 * 60  # 09:00, in minutes since midnight
             
-            for poi in day_pois:
-                duration = pace_rule.get("min_duration_minutes", 60)
-                end_time = curr_time + timedelta(minutes=duration)
+            for name, poi_type, desc in day_pois:
+                end = curr + duration
                 activities.append({
-                    "time_slot": f"{curr_time.strftime('%H:%M')} - {end_time.strftime('%H:%M')}",
-                    "location": poi["name"],
-                    "activity_type": poi["type"],
-                    "description": poi["desc"],
+                    "time_slot": f"{_fmt_minutes(curr)} - {_fmt_minutes(end)}",
+                    "location": name,
+                    "activity_type": poi_type,
+                    "description": desc,
                     "duration_minutes": duration,
                     "travel_distance_km": 5.0
                 })
-                curr_time = end_time + timedelta(minutes=pace_rule.get("gap_between_activities_minutes", 30))
+                curr = end + gap
             
             itinerary_days.append({
                 "day_number": d,
@@ -174,7 +216,7 @@ class MockLLMClient:
         return json.dumps({
             "summary": f"A grounded {days}-day itinerary for {city_match} using only verified data.",
             "days": itinerary_days,
-            "suggestions": [{"name": p["name"], "type": p["type"]} for p in random.sample(poi_pool, min(3, len(poi_pool)))],
+            "suggestions": [{"name": name, "type": poi_type} for name, poi_type, _ in rng.sample(poi_pool, min(3, len(poi_pool)))],
             "pro_tips": ["Follow local customs and dress modestly at religious sites.", "Use public transport for efficiency."],
             "grounding_source": "Local JSON Dataset"
         })
@@ -185,7 +227,9 @@ class MockLLMClient:
         city_match = None
         
         # 1. Try searching in the question part first (Highest priority: User's intent)
-        if "itinerary context:" in prompt_lower:
+        if "user question:" in prompt_lower:
+            question_part = prompt_lower.split("user question:", 1)[1].split("itinerary context:")[0]
+        elif "itinerary context:" in prompt_lower:
             question_part = prompt_lower.split("itinerary context:")[0]
         elif "itinerary context:" in prompt_lower.lower():
              # Handle any casing
@@ -2,119 +2,162 @@
 Itinerary Planner - Role 2 AI.
 Generates day-wise travel itineraries based on constraints.
 """
-import json
-from typing import Optional
-from datetime import datetime, timedelta
-
-from .llm_client import get_llm_client
+import asyncio
+import logging
+import re
+from collections import deque
+from functools import lru_cache
+from typing import Optional, AsyncIterator
+
+from .llm_client import get_llm_client, count_tokens
 from ..models.form_schema import TravelForm
-from ..models.itinerary import Itinerary, DayPlan, Activity, ActivityType
+from ..models.itinerary import (
+    Itinerary, DayPlan, Activity, ActivityType, HotelRecommendation,
+    RawItinerary, RawDayPlan, RawActivity, ITINERARY_JSON_SCHEMA
+)
 from .external_tools import external_tools
+from .response_cache import ResponseCache
+from .json_stream import JsonArrayStream
 
+logger = logging.getLogger(__name__)
 
+PLANNER_SYSTEM_PROMPT = """You are a professional travel planning engine (logistics planner, travel consultant and scheduler) producing premium, CRM-ready itineraries comparable to paid travel plans.
 
-import traceback
-
-PLANNER_SYSTEM_PROMPT = """You are a PROFESSIONAL TRAVEL PLANNING ENGINE integrated into a CRM platform.
-Your job: generate highly polished, structured, premium-quality travel itineraries comparable to Itinr, MakeMyTrip, and Booking.com.
-You are NOT a chatbot. You are a logistics planner + travel consultant + scheduler. Output must feel like a real, paid travel plan.
-
-## STRICT RULES
-- NEVER use emojis, icons, symbols, or casual language
-- TIME FORMAT: '09:00 AM' or '01:30 PM' only. NEVER seconds
-- Output must be clean, CRM-ready, professional
-- ALL text must be in ENGLISH ONLY. Never output Arabic, Hindi, Cyrillic, or any non-Latin script. Translate any non-English place names to their English equivalent
-
-## PLANNING CONSTRAINT ENGINE (ALL MANDATORY)
-1. Day density -- do NOT overload
-2. Travel distance between locations
-3. Traffic probability
-4. Time required per attraction: Major landmark=1.5-2hrs, Museum=1-1.5hrs, Market=45-60min, Viewpoint=30-40min
-5. Weather comfort (Hot: outdoor AM/PM, indoor midday | Rain: museums/cafes/covered | Cold: late start, indoor clusters)
-6. Crowd patterns and peak timing
-7. Hotel start/end logic (check-in/checkout timing respected)
-8. Cab pickup timing and travel mode (cab/walk/metro/mix)
-9. Closed day assumptions
-10. Rest gaps between activities
-
-## DENSITY CONTROL (PER DAY)
-- 2 major attractions
-- 1 secondary attraction
-- 1 indoor activity (buffer)
-- 1 lunch window
-- 1 evening experience
-- 1 dinner zone
-Never overload. Never exceed this.
-
-## AREA-CLUSTERING (CRITICAL)
-Plan each day by geography. Example for Mumbai:
-Day 1 = South Mumbai cluster, Day 2 = Fort + Marine Drive cluster, Day 3 = Bandra + Juhu cluster.
-Avoid cross-city movement within a day.
-
-## TIME STRUCTURE (STRICT)
-09:00 AM - Start from hotel
-10:30 AM - Major attraction
-12:30 PM - Secondary place
-01:30 PM - Lunch break
-03:30 PM - Indoor/cultural spot
-05:30 PM - Scenic walk
-07:30 PM - Dinner area
-09:00 PM - Return to hotel
-Always include travel buffer and realistic pacing.
-
-## HOTEL LOGIC
-Hotel appears only at morning start and night return. Respect check-in/checkout times.
-Check-in day = lighter morning. Checkout day = flexible exit.
-
-## RESTAURANT RULE
-Food is supportive, not dominant. Only include:
-- 1 lunch area suggestion per day
-- 1 dinner area suggestion per day
-No food hopping.
-
-## ANTI-HALLUCINATION
-Use ONLY: dataset POIs, known landmarks, or recognized areas.
-If specific data missing: use area-level planning, NOT fake names.
-
-## QUALITY FILTER (PRE-OUTPUT CHECK)
-Before outputting, verify: no repeated locations, no fake places, clean timeline, logical travel flow, balanced density, weather-adapted, distance-aware grouping.
-
-## TONE
-Professional. Structured. Calm. Concise. Confident. Like a real travel consultant report.
-
-## OUTPUT SCHEMA (STRICT JSON)
-Return strictly valid JSON:
-{
-  "summary": "Professional trip overview: destination, duration, travel type, weather overview, best areas to stay",
-  "hotel_recommendations": [
-    {
-      "name": "Hotel Name",
-      "rating": "Budget/Mid-Range/Luxury",
-      "location": "Area name",
-      "description": "Why suitable, professional summary",
-      "price_range": "$$"
-    }
-  ],
-  "days": [
-    {
-      "day_number": 1,
-      "date": "YYYY-MM-DD",
-      "theme": "Area Focus Title (e.g. South Mumbai Heritage Trail)",
-      "weather": "Short weather summary for the day",
-      "activities": [
-        {
-          "time": "09:00 AM",
-          "location": "Place Name",
-          "type": "sightseeing/meal/cultural/shopping/nature/travel/checkin/checkout",
-          "description": "Professional description including travel mode and distance note",
-          "duration_minutes": 120
-        }
-      ]
-    }
-  ]
-}
+RULES:
+- Professional, calm, concise English only. No emojis, symbols or casual language. Translate non-Latin place names to English. Times as '09:00 AM', never seconds.
+- Use only dataset POIs, known landmarks or recognized areas. If data is missing, plan at area level; never invent places or repeat locations.
+- Per day at most: 2 major attractions, 1 secondary, 1 indoor buffer, 1 lunch area, 1 evening experience, 1 dinner area. No food hopping.
+- Visit lengths: major landmark 1.5-2h, museum 1-1.5h, market 45-60min, viewpoint 30-40min. Include travel buffers and rest gaps.
+- Respect daily start/end, hotel check-in (lighter morning) and checkout (flexible exit), cab pickup, travel mode, traffic, closed days and max daily distance. Hotels appear only as morning start and night return.
+- Adapt to weather (hot: outdoor early/late, indoor midday; rain: museums/cafes/covered; cold: late start, indoor clusters) and avoid crowd peaks.
 """
 
+# Bump when the planner prompts change so cached responses from older prompts are not reused
+PLANNER_PROMPT_VERSION = 4
+
+# Static generation instructions and response schema. Kept separate from the per-request
+# user message so providers with prefix caching can reuse the whole static block.
+PLANNER_INSTRUCTIONS = """INSTRUCTIONS:
+1. Use REAL locations from the request's REAL-WORLD DATA; no placeholders ("Local eatery", "Drive to...").
+2. Fill DAILY START to DAILY END every day; do not stop early.
+3. Give each day a short 'weather' summary; estimate 'travel_distance_km' between stops realistically (typically 2-10 km).
+4. Return ONLY raw JSON (no markdown fences) shaped like:
+{"summary":"","hotel_recommendations":[{"name":"","rating":"4-star","location":"","description":"","price_range":"$$"}],"suggestions":[{"title":"","description":"","icon":""}],"pro_tips":[""],"days":[{"day_number":1,"date":"YYYY-MM-DD","theme":"","weather":"","total_distance_km":0,"activities":[{"time_slot":"HH:MM","location":"","activity_type":"sightseeing|meal|cultural|shopping|adventure|rest|travel|checkin|checkout","description":"","duration_minutes":60,"travel_distance_km":0}]}]}"""
+
+# Few-shot guidance only sent for multi-day or multi-city trips
+PLANNER_MULTI_DAY_GUIDE = """MULTI-DAY PLANNING:
+- Cluster each day by geography and avoid cross-city movement within a day (e.g. Mumbai: Day 1 South Mumbai, Day 2 Fort + Marine Drive, Day 3 Bandra + Juhu).
+- Reference day: 09:00 AM leave hotel, 10:30 AM major attraction, 12:30 PM secondary place, 01:30 PM lunch, 03:30 PM indoor/cultural spot, 05:30 PM scenic walk, 07:30 PM dinner area, 09:00 PM return to hotel."""
+
+# Human-readable labels for form fields in the HARD CONSTRAINTS block, in prompt order
+_FIELD_LABELS: tuple[tuple[str, str], ...] = (
+    ("trip_duration_days", "Trip Duration"),
+    ("trip_duration_nights", "Nights"),
+    ("traveler_count", "Number of Travelers"),
+    ("group_type", "Group Type"),
+    ("destinations", "Destinations"),
+    ("start_date", "Start Date"),
+    ("end_date", "End Date"),
+    ("daily_start_time", "Daily Start Time"),
+    ("daily_end_time", "Daily End Time"),
+    ("weather_preference", "Weather Preference"),
+    ("closed_days_restrictions", "Closed Days"),
+    ("local_guidelines", "Local Guidelines"),
+    ("max_travel_distance_km", "Max Daily Travel Distance"),
+    ("sightseeing_pace", "Sightseeing Pace"),
+    ("cab_pickup_required", "Cab Pickup Required"),
+    ("hotel_checkin_time", "Hotel Check-in Time"),
+    ("hotel_checkout_time", "Hotel Check-out Time"),
+    ("traffic_consideration", "Consider Traffic"),
+    ("travel_mode", "Travel Mode"),
+    ("budget", "Budget Level"),
+)
+
+# Anti-filler keyword matchers used by _should_keep (one scan per field instead of one per keyword)
+_HOTEL_LOCATION_RE = re.compile(r"check-in|check in|hotel|resort|stay at")
+_HOTEL_DESCRIPTION_RE = re.compile(r"check-in|check in|hotel stay|checking in")
+_FILLER_LOCATION_RE = re.compile(r"travel to|drive to|walking to|transit")
+_FILLER_DESCRIPTION_RE = re.compile(r"travel to|drive to|walking to|heading to")
+_TRANSIT_HUB_RE = re.compile(r"railway station|airport|bus stand")
+_LEISURE_RE = re.compile(r"explore|stroll")
+
+# ActivityType by value; off-schema types from the LLM fall back to sightseeing without raising
+_ACTIVITY_LOOKUP: dict[str, ActivityType] = {activity_type.value: activity_type for activity_type in ActivityType}
+
+# Reply token budget for generation: summary/hotels plus a per-day allowance, clamped
+PLANNER_TOKENS_BASE = 300
+PLANNER_TOKENS_PER_DAY = 450
+PLANNER_TOKENS_MIN = 1200
+PLANNER_TOKENS_MAX = 6000
+# Share of the hard max_tokens limit given to the model as its length target, so a reply
+# that runs somewhat long still finishes instead of being cut off
+PLANNER_LENGTH_TARGET_RATIO = 0.75
+
+# Max number of distinct forms whose formatted constraints are kept
+CONSTRAINTS_CACHE_SIZE = 256
+
+# Max number of generate/modify responses kept for identical repeat requests, and for how long (seconds)
+RESPONSE_CACHE_SIZE = 512
+RESPONSE_CACHE_TTL = 3600
+
+# External context (places, food, weather) per destination/budget/dates, and how long a
+# degraded or failed lookup is kept so an upstream outage isn't retried on every request
+# but recovers quickly (seconds)
+CONTEXT_CACHE_SIZE = 256
+CONTEXT_CACHE_TTL = 3600
+CONTEXT_DEGRADED_TTL = 60
+
+# Fully static message prefix shared by generate and modify; the cache breakpoint
+# marks the end of the cacheable prefix (forwarded to providers that support it).
+# Q&A starts with the same first message so all planner calls share a cached prefix.
+PLANNER_STATIC_MESSAGES = (
+    {"role": "system", "content": PLANNER_SYSTEM_PROMPT},
+    {"role": "system", "content": PLANNER_INSTRUCTIONS, "cache_control": {"type": "ephemeral"}},
+)
+
+
+@lru_cache(maxsize=2)
+def _static_prompt_tokens(multi_day: bool) -> int:
+    """Token count of the static prompt prefix, tokenized once per process."""
+    parts = [m["content"] for m in PLANNER_STATIC_MESSAGES]
+    if multi_day:
+        parts.append(PLANNER_MULTI_DAY_GUIDE)
+    return count_tokens("\n".join(parts))
+
+
+def _should_keep(raw: RawActivity) -> bool:
+    """Anti-filler filter: drop hotel, travel/drive and transit-hub stroll blocks."""
+    loc_lower = raw.location.lower()
+    desc_lower = raw.description.lower()
+
+    # Check for Hotel/Check-in explicitly
+    if _HOTEL_LOCATION_RE.search(loc_lower) or _HOTEL_DESCRIPTION_RE.search(desc_lower):
+        logger.debug("Filtered out hotel activity: %s", raw.location)
+        return False
+
+    # Travel/drive blocks are filler even when marked as sightseeing
+    if _FILLER_LOCATION_RE.search(loc_lower) or _FILLER_DESCRIPTION_RE.search(desc_lower):
+        return False
+
+    # Skip transit hubs as sightseeing
+    return not (_TRANSIT_HUB_RE.search(loc_lower) and _LEISURE_RE.search(desc_lower))
+
+
+def _coerce_activity(raw: RawActivity) -> Activity:
+    """Build an Activity from a validated LLM activity, defaulting unknown types to sightseeing."""
+    activity_type = _ACTIVITY_LOOKUP.get(raw.activity_type.lower(), ActivityType.SIGHTSEEING)
+
+    return Activity(
+        time_slot=raw.time_slot or raw.time or "09:00 - 10:00",
+        location=raw.location,
+        activity_type=activity_type,
+        description=raw.description,
+        travel_distance_km=raw.travel_distance_km,
+        duration_minutes=int(raw.duration_minutes),
+        notes=raw.notes
+    )
+
+
 # ITINERARY GENERATION AND MODIFICATION LOGIC
 # This section handles the generation of structured itineraries 
 # using the elite travel concierge persona.
@@ -126,6 +169,13 @@ class ItineraryPlanner:
     
     def __init__(self):
         self.llm = get_llm_client()
+        # Formatted constraints keyed by the form's filled values (reused by retries and modify)
+        self._constraints_cache: dict[frozenset, str] = {}
+        # Raw LLM itinerary responses keyed by request inputs; parsed into a fresh Itinerary per call
+        self._response_cache = ResponseCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL)
+        # External context per destination/budget/dates; degraded results are kept only briefly
+        self._context_cache = ResponseCache(maxsize=CONTEXT_CACHE_SIZE, ttl=CONTEXT_CACHE_TTL)
+        self._degraded_contexts = ResponseCache(maxsize=CONTEXT_CACHE_SIZE, ttl=CONTEXT_DEGRADED_TTL)
     
     async def generate(
         self,
@@ -142,38 +192,69 @@ class ItineraryPlanner:
         Returns:
             Generated Itinerary object
         """
-        # Format constraints for the prompt
-        constraints = self._format_constraints(form)
-        preferences = "\n".join(soft_preferences) if soft_preferences else "None provided"
+        cache_key = self._generate_cache_key(form, soft_preferences)
         
-        # Fetch external context (Places & Food)
         try:
-            destinations = form.destinations
-            # Handle list, string, or None
-            if isinstance(destinations, list) and destinations:
-                main_dest = str(destinations[0])
-            elif isinstance(destinations, str):
-                main_dest = destinations
-            else:
-                main_dest = "the destination"
-            
-            external_context = await external_tools.get_recommendations(
-                main_dest, 
-                budget=form.budget or "standard",
-                start_date=form.start_date.isoformat() if form.start_date else None,
-                end_date=form.end_date.isoformat() if form.end_date else None
+            # Identical concurrent requests share the first one's LLM call
+            result, hotel_recs = await self._response_cache.get_or_create(
+                cache_key,
+                lambda: self._request_itinerary(form, soft_preferences),
+                cacheable=lambda response: self._is_complete(response[0], form.trip_duration_days or 1)
             )
-        except Exception as e:
-            print(f"Error fetching external context: {e}")
-            external_context = "No external data available."
-
+            return self._parse_itinerary(result, hotel_recs=list(hotel_recs))
+        except Exception:
+            # Re-raised so the API returns a 500; the traceback is only formatted if ERROR is logged
+            logger.exception("Planner.generate failed")
+            raise
 
+    async def generate_stream(
+        self,
+        form: TravelForm,
+        soft_preferences: list[str] = None
+    ) -> AsyncIterator[DayPlan]:
+        """
+        Generate an itinerary day by day, yielding each DayPlan as soon as it has
+        been streamed from the LLM and its distances corrected.
+        """
+        main_dest = self._get_main_destination(form)
+        max_tokens = self._token_budget(form.trip_duration_days or 1)
+        messages = await self._build_generate_messages(form, soft_preferences, main_dest, max_tokens)
         
-
+        parser = JsonArrayStream("days")
+        pending: deque[asyncio.Task] = deque()
         try:
-            messages = [
-                {"role": "system", "content": PLANNER_SYSTEM_PROMPT},
-                {"role": "user", "content": f"""HARD CONSTRAINTS:
+            async for delta in self.llm.chat_json_stream(messages, temperature=0.1, max_tokens=max_tokens, schema=ITINERARY_JSON_SCHEMA):
+                for day_data in parser.feed(delta):
+                    # Correct this day's distances while later days are still decoding
+                    pending.append(asyncio.create_task(self._correct_day_distances(day_data)))
+                while pending and pending[0].done():
+                    yield self._parse_day(RawDayPlan.model_validate(pending.popleft().result()))
+            while pending:
+                yield self._parse_day(RawDayPlan.model_validate(await pending.popleft()))
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _token_budget(self, num_days: int) -> int:
+        """Size the reply budget to the trip length so short trips don't reserve a full 4k tokens."""
+        estimate = PLANNER_TOKENS_BASE + PLANNER_TOKENS_PER_DAY * max(num_days, 1)
+        return max(PLANNER_TOKENS_MIN, min(PLANNER_TOKENS_MAX, estimate))
+
+    async def _build_generate_messages(self, form: TravelForm, soft_preferences: Optional[list[str]], main_dest: str, max_tokens: int) -> list[dict]:
+        """Fetch the external context and build the generation prompt."""
+        preferences = "\n".join(soft_preferences) if soft_preferences else "None provided"
+        
+        # Warm up the LLM connection and format constraints while the external context
+        # (Places & Food) is being fetched
+        self.llm.warm_up()
+        constraints, external_context = await asyncio.gather(
+            asyncio.to_thread(self._format_constraints, form),
+            self._fetch_external_context(form, main_dest)
+        )
+
+        return [
+            *self._build_static_messages(form),
+            {"role": "user", "content": f"""HARD CONSTRAINTS:
 {constraints}
 
 SOFT PREFERENCES:
@@ -182,68 +263,194 @@ SOFT PREFERENCES:
 REAL-WORLD DATA (Use these for lodging and meals):
 {external_context}
 
-INSTRUCTIONS:
-1. Generate a high-quality, balanced itinerary using REAL locations from the list above.
-2. FULL COVERAGE: Fill the ENTIRE time range from DAILY START to DAILY END time. Do NOT stop early.
-3. WEATHER & DISTANCE: Include a brief 'weather' summary for each day in the JSON. Estimate 'travel_distance_km' realistically between spots (typically 2-10km).
-4. DO NOT use placeholders like "Local eatery" or "Drive to...".
-5. Return ONLY RAW JSON matching the schema below. No markdown fences.
-
-SCHEMA:
- {{
-   "summary": "Short overview",
-   "hotel_recommendations": [ {{ "name": "Name", "rating": "4-star", "location": "Area", "description": "Why", "price_range": "$$" }} ],
-   "suggestions": [ {{ "title": "Place", "description": "Why", "icon": "..." }} ],
-   "pro_tips": [ "Advice" ],
-   "days": [ {{ 
-     "day_number": 1, 
-     "date": "YYYY-MM-DD", 
-     "weather": "Sunny, 25°C",
-     "total_distance_km": 0,
-     "activities": [ {{ "time_slot": "HH:MM", "location": "Real Name", "description": "...", "travel_distance_km": 0 }} ] 
-   }} ]
- }}"""}
-            ]
-            
-            print(f"DEBUG: Sending request to LLM (Provider: {self.llm.provider})...")
-            result = await self.llm.chat_json(messages, temperature=0.1, max_tokens=4096)
-            print(f"DEBUG: LLM Response received: {str(result)[:100]}...")
-            
-            # Recalculate distances (Correction step)
-            try:
-                result = await external_tools.update_itinerary_distances(result)
-            except Exception as e:
-                print(f"Distance calculation failed: {e}")
+LENGTH: Target about {int(max_tokens * PLANNER_LENGTH_TARGET_RATIO)} tokens in total; keep descriptions brief."""}
+        ]
 
-            # Inject destination for fallback logic
-            result["meta_destination"] = main_dest
-            
-            return self._parse_itinerary(result)
+    async def _request_itinerary(self, form: TravelForm, soft_preferences: list[str] = None) -> tuple[dict, list]:
+        """Fetch context, call the LLM and correct distances; returns the raw itinerary dict and parsed hotels."""
+        main_dest = self._get_main_destination(form)
+        max_tokens = self._token_budget(form.trip_duration_days or 1)
+        messages = await self._build_generate_messages(form, soft_preferences, main_dest, max_tokens)
+        
+        logger.debug("Sending request to LLM (Provider: %s)...", self.llm.provider)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Prompt tokens: ~%d static + ~%d request (reply budget %d)",
+                _static_prompt_tokens(self._is_multi_day(form)), count_tokens(messages[-1]["content"]), max_tokens
+            )
+        # Look up the Local DB fallback hotels while the LLM is generating
+        fallback_hotels = asyncio.create_task(asyncio.to_thread(self._fetch_fallback_hotels, main_dest))
+        try:
+            result = await self._stream_itinerary(messages, max_tokens, form.trip_duration_days or 1)
+            if result is None:
+                # Failed, truncated or short reply: retry once with double the budget and
+                # corrective retries (a result still short of days is not cached)
+                retry_tokens = min(PLANNER_TOKENS_MAX, max_tokens * 2)
+                raw = await self.llm.chat_model(messages, RawItinerary, temperature=0.1, max_tokens=retry_tokens, schema=ITINERARY_JSON_SCHEMA)
+                logger.debug("LLM Response received: %.100s...", raw)
+                result = await self._correct_distances(raw.model_dump())
+        except BaseException:
+            fallback_hotels.cancel()
+            raise
+        
+        # Inject destination for fallback logic
+        result["meta_destination"] = main_dest
+        hotel_recs = await self._collect_hotels(result, fallback_hotels)
+        return result, hotel_recs
+
+    async def _stream_itinerary(self, messages: list[dict], max_tokens: int, num_days: int) -> Optional[dict]:
+        """
+        Stream the itinerary, correcting each day's distances as soon as the day is
+        complete so the lookups overlap with decoding of the later days.
+        The full reply goes through the engine's JSON repair (fences, smart quotes);
+        returns None if it was cut off at max_tokens, has fewer than num_days days or
+        still doesn't validate as a RawItinerary.
+        """
+        parser = JsonArrayStream("days")
+        day_tasks: list[asyncio.Task] = []
+        stream_info: dict = {}
+        try:
+            async for delta in self.llm.chat_json_stream(messages, temperature=0.1, max_tokens=max_tokens, schema=ITINERARY_JSON_SCHEMA, stream_info=stream_info):
+                for day_data in parser.feed(delta):
+                    day_tasks.append(asyncio.create_task(self._validate_and_correct_day(day_data)))
+            if stream_info.get("finish_reason") == "length":
+                logger.warning("Streamed itinerary cut off at %d tokens, retrying with a larger budget", max_tokens)
+                return None
+            raw = RawItinerary.model_validate(self.llm.parse_json(parser.text))
+            result = raw.model_dump()
+            if not raw.error and len(raw.days) < num_days:
+                logger.warning("Streamed itinerary has %d of %d days, retrying with a larger budget", len(raw.days), num_days)
+                return None
+            if len(day_tasks) == len(raw.days):
+                result["days"] = list(await asyncio.gather(*day_tasks))
+            else:
+                # Repaired reply (e.g. a truncated last day) doesn't line up with the streamed days
+                result = await self._correct_distances(result)
         except Exception as e:
-            print(f"CRITICAL ERROR in Planner.generate: {e}")
-            traceback.print_exc()
-            # Return a fallback empty itinerary or re-raise to see 500
-            # For debugging, we re-raise but now we have logs
-            raise e
+            logger.warning("Streamed itinerary unusable, retrying without streaming: %s", e)
+            return None
+        finally:
+            for task in day_tasks:
+                task.cancel()
+        
+        logger.debug("LLM Response received: %.100s...", parser.text)
+        return result
+
+    def _is_complete(self, result: dict, num_days: int) -> bool:
+        """Whether an itinerary is worth caching: not an engine error and no days missing."""
+        return not result.get("error") and len(result.get("days") or []) >= num_days
+
+    async def _validate_and_correct_day(self, day_data: dict) -> dict:
+        """Normalize a streamed day like the full RawItinerary validation would, then correct its distances."""
+        return await self._correct_day_distances(RawDayPlan.model_validate(day_data).model_dump())
+
+    async def _collect_hotels(self, result: dict, fallback_hotels: asyncio.Task) -> list[HotelRecommendation]:
+        """LLM hotel recommendations if any, else the prefetched Local DB hotels."""
+        hotel_recs = self._parse_llm_hotels(result)
+        if hotel_recs:
+            fallback_hotels.cancel()
+            return hotel_recs
+        logger.debug("No hotels from LLM, using Local DB hotels for %s", result["meta_destination"])
+        return await fallback_hotels
+
+    async def _correct_day_distances(self, day_data: dict) -> dict:
+        """Recompute one day's travel distances, keeping the LLM's figures if the lookup fails."""
+        try:
+            return await external_tools.update_day_distances(day_data)
+        except Exception as e:
+            logger.warning("Distance calculation failed: %s", e)
+            return day_data
 
+    async def _correct_distances(self, result: dict) -> dict:
+        """Recompute travel distances, keeping the LLM's figures if the lookup fails."""
+        try:
+            return await external_tools.update_itinerary_distances(result)
+        except Exception as e:
+            logger.warning("Distance calculation failed: %s", e)
+            return result
+
+    def _build_static_messages(self, form: TravelForm) -> list[dict]:
+        """Static prompt prefix, plus the multi-day guide when the trip spans several days or cities."""
+        messages = [dict(m) for m in PLANNER_STATIC_MESSAGES]
+        if self._is_multi_day(form):
+            messages.append({"role": "system", "content": PLANNER_MULTI_DAY_GUIDE})
+        return messages
+
+    def _is_multi_day(self, form: TravelForm) -> bool:
+        """Whether the trip spans several days or cities (adds the multi-day guide)."""
+        return (form.trip_duration_days or 1) > 1 or len(form.destinations or []) > 1
+
+    def _get_main_destination(self, form: TravelForm) -> str:
+        """Pick the destination used for external data lookups."""
+        destinations = form.destinations
+        # Handle list, string, or None
+        if isinstance(destinations, list) and destinations:
+            return str(destinations[0])
+        elif isinstance(destinations, str):
+            return destinations
+        return "the destination"
+
+    async def _fetch_external_context(self, form: TravelForm, main_dest: str) -> str:
+        """Fetch real-world data for the prompt (cached), degrading to a placeholder on failure."""
+        budget = form.budget or "standard"
+        start_date = form.start_date.isoformat() if form.start_date else None
+        end_date = form.end_date.isoformat() if form.end_date else None
+        key = ResponseCache.make_key(main_dest, budget, start_date, end_date)
+        degraded = self._degraded_contexts.get(key)
+        if degraded is not None:
+            return degraded
+        try:
+            context = await self._context_cache.get_or_create(
+                key,
+                lambda: external_tools.get_recommendations(main_dest, budget=budget, start_date=start_date, end_date=end_date),
+                cacheable=lambda result: not external_tools.is_degraded_context(result, start_date, end_date)
+            )
+        except Exception as e:
+            logger.warning("Error fetching external context: %s", e)
+            context = "No external data available."
+        if external_tools.is_degraded_context(context, start_date, end_date):
+            self._degraded_contexts.set(key, context)
+        return context
     
     async def answer_question(self, itinerary: Itinerary, question: str, destination: str = "your destination") -> str:
         """
         Answer a question about the generated itinerary.
         """
+        context = self._build_qa_context(itinerary, destination)
+        messages = self._build_qa_messages(context, question, destination)
+        
+        return await self.llm.chat(messages, temperature=0.7, max_tokens=300)
+
+    async def answer_questions(self, itinerary: Itinerary, questions: list[str], destination: str = "your destination") -> list[str]:
+        """
+        Answer several questions about the same itinerary concurrently.
+        The itinerary context is built once and shared; answers keep the order of the questions.
+        """
+        context = self._build_qa_context(itinerary, destination)
+        batch = [self._build_qa_messages(context, q, destination) for q in questions]
+        
+        return await self.llm.chat_batch(batch, temperature=0.7, max_tokens=300)
+
+    def _build_qa_context(self, itinerary: Itinerary, destination: str) -> str:
+        """Summarise the itinerary as plain-text context for Q&A."""
         context = f"Destination: {destination}\n"
         context += f"Trip Summary: {itinerary.summary}\n"
         for day in itinerary.days:
             context += f"Day {day.day_number}: {day.theme or 'Exploration'}\n"
             for act in day.activities:
                 context += f"- {act.time_slot}: {act.location} ({act.activity_type.value})\n"
-        
-        messages = [
-            {"role": "system", "content": f"You are a helpful travel assistant for {destination}. Answer the user's question based on the provided itinerary context. Keep answers regular length (2-3 sentences)."},
-            {"role": "user", "content": f"USER QUESTION: {question}\n\nITINERARY CONTEXT:\n{context}"}
+        return context
+
+    def _build_qa_messages(self, context: str, question: str, destination: str) -> list[dict]:
+        """
+        Build the chat messages for a single itinerary question: the shared planner
+        system prompt, then the Q&A instructions, then the itinerary and the question last.
+        """
+        return [
+            dict(PLANNER_STATIC_MESSAGES[0]),
+            {"role": "system", "content": f"For this request you are a helpful travel assistant for {destination}. Answer the user's question based on the provided itinerary context, in plain text (no JSON). Keep answers regular length (2-3 sentences)."},
+            {"role": "user", "content": f"ITINERARY CONTEXT:\n{context}\nUSER QUESTION: {question}"}
         ]
-        
-        return await self.llm.chat(messages, temperature=0.7, max_tokens=300)
 
     async def modify(
         self,
@@ -264,12 +471,15 @@ SCHEMA:
         Returns:
             Modified Itinerary object
         """
-        constraints = self._format_constraints(form)
-        current_plan = json.dumps(current_itinerary.to_display_dict())
+        constraints, current_plan = await asyncio.gather(
+            asyncio.to_thread(self._format_constraints, form),
+            asyncio.to_thread(current_itinerary.to_display_json)
+        )
         preferences = "\n".join(soft_preferences) if soft_preferences else "None"
+        max_tokens = self._token_budget(len(current_itinerary.days))
         
         messages = [
-            {"role": "system", "content": PLANNER_SYSTEM_PROMPT},
+            *self._build_static_messages(form),
             {"role": "user", "content": f"""HARD CONSTRAINTS (still apply):
 {constraints}
 
@@ -285,54 +495,103 @@ SOFT PREFERENCES:
 Generate the modified itinerary. Remember: constraints cannot be violated even for modifications."""}
         ]
         
-        result = await self.llm.chat_json(messages, temperature=0.7, max_tokens=3000)
+        cache_key = ResponseCache.make_key(
+            "modify", PLANNER_PROMPT_VERSION, form.model_dump(mode="json"), sorted(soft_preferences or []),
+            modification_request, current_plan
+        )
+        raw = await self._response_cache.get_or_create(
+            cache_key,
+            lambda: self.llm.chat_model(messages, RawItinerary, temperature=0.7, max_tokens=max_tokens, schema=ITINERARY_JSON_SCHEMA),
+            cacheable=lambda response: not response.error
+        )
         
-        itinerary = self._parse_itinerary(result)
+        itinerary = self._parse_itinerary(raw.model_dump())
         itinerary.version = current_itinerary.version + 1
+        
+        # The user has moved on from the generated plan; regenerating should start fresh
+        self._response_cache.invalidate(self._generate_cache_key(form, soft_preferences))
         return itinerary
+
+    def _generate_cache_key(self, form: TravelForm, soft_preferences: Optional[list[str]]) -> str:
+        """Response cache key for generate: the full form, preferences (order-insensitive) and prompt version."""
+        return ResponseCache.make_key(
+            "generate", PLANNER_PROMPT_VERSION, form.model_dump(mode="json"), sorted(soft_preferences or [])
+        )
     
     def _format_constraints(self, form: TravelForm) -> str:
-        """Format form data as readable constraints."""
+        """Format form data as readable constraints (memoized on the filled values)."""
         filled = form.get_filled_fields()
-        lines = []
-        
-        field_labels = {
-            "trip_duration_days": "Trip Duration",
-            "trip_duration_nights": "Nights",
-            "traveler_count": "Number of Travelers",
-            "group_type": "Group Type",
-            "destinations": "Destinations",
-            "start_date": "Start Date",
-            "end_date": "End Date",
-            "daily_start_time": "Daily Start Time",
-            "daily_end_time": "Daily End Time",
-            "weather_preference": "Weather Preference",
-            "closed_days_restrictions": "Closed Days",
-            "local_guidelines": "Local Guidelines",
-            "max_travel_distance_km": "Max Daily Travel Distance",
-            "sightseeing_pace": "Sightseeing Pace",
-            "cab_pickup_required": "Cab Pickup Required",
-            "hotel_checkin_time": "Hotel Check-in Time",
-            "hotel_checkout_time": "Hotel Check-out Time",
-            "traffic_consideration": "Consider Traffic",
-            "travel_mode": "Travel Mode",
-            "budget": "Budget Level",
-        }
+        key = frozenset(
+            (field, tuple(value) if isinstance(value, list) else value)
+            for field, value in filled.items()
+        )
+        cached = self._constraints_cache.get(key)
+        if cached is not None:
+            return cached
         
-        for field, value in filled.items():
-            label = field_labels.get(field, field)
+        lines = []
+        for field, label in _FIELD_LABELS:
+            if field not in filled:
+                continue
+            value = filled[field]
             if isinstance(value, list):
-                value = ", ".join(str(v) for v in value)
+                value = ", ".join(map(str, value))
             lines.append(f"- {label}: {value}")
         
-        return "\n".join(lines)
+        constraints = "\n".join(lines)
+        if len(self._constraints_cache) >= CONSTRAINTS_CACHE_SIZE:
+            self._constraints_cache.clear()
+        self._constraints_cache[key] = constraints
+        return constraints
     
-    def _parse_itinerary(self, data: dict) -> Itinerary:
-        """Parse LLM response into Itinerary object."""
-        days = []
+    def _parse_itinerary(self, data: dict, hotel_recs: Optional[list] = None) -> Itinerary:
+        """Parse LLM response into Itinerary object (hotel_recs may be pre-parsed by the caller)."""
+        if hotel_recs is None:
+            hotel_recs = self._parse_hotel_recommendations(data)
+
+        raw = RawItinerary.model_validate(data)
+        days = [self._parse_day(raw_day) for raw_day in raw.days]
         
-        # Parse Hotel Recommendations
-        from ..models.itinerary import HotelRecommendation
+        return Itinerary(
+            summary=raw.summary,
+            days=days,
+            hotel_recommendations=hotel_recs,
+            soft_preferences_applied=raw.soft_preferences_applied,
+            soft_preferences_ignored=raw.soft_preferences_ignored,
+            changes_made=raw.changes_made,
+            change_summary=raw.change_summary,
+            suggestions=raw.suggestions,
+            pro_tips=raw.pro_tips
+        )
+
+    def _parse_day(self, raw_day: RawDayPlan) -> DayPlan:
+        """Parse one validated day of the LLM response, dropping filler activities."""
+        activities = [_coerce_activity(raw) for raw in raw_day.activities if _should_keep(raw)]
+
+        day = DayPlan(
+            day_number=raw_day.day_number,
+            date=raw_day.date,
+            theme=raw_day.theme,
+            activities=activities,
+            total_distance_km=raw_day.total_distance_km,
+            weather=raw_day.weather
+        )
+        day.calculate_total_distance()
+        return day
+
+    def _parse_hotel_recommendations(self, data: dict) -> list[HotelRecommendation]:
+        """Parse hotel recommendations, falling back to the Local DB for the destination."""
+        hotel_recs = self._parse_llm_hotels(data)
+        
+        # Fallback: If no hotels from LLM, fetch from Local DB
+        dest = data.get("meta_destination")
+        if not hotel_recs and dest:
+            logger.debug("No hotels from LLM, fetching for %s...", dest)
+            hotel_recs = self._fetch_fallback_hotels(dest)
+        return hotel_recs
+
+    def _parse_llm_hotels(self, data: dict) -> list[HotelRecommendation]:
+        """Parse the hotel recommendations returned by the LLM, skipping invalid ones."""
         hotel_recs = []
         for h in data.get("hotel_recommendations", []):
             try:
@@ -344,127 +603,33 @@ Generate the modified itinerary. Remember: constraints cannot be violated even f
                     price_range=h.get("price_range")
                 ))
             except Exception as e:
-                print(f"Skipping invalid hotel rec: {e}")
+                logger.debug("Skipping invalid hotel rec: %s", e)
+        return hotel_recs
 
-        # Fallback: If no hotels from LLM, fetch from Local DB
-        if not hotel_recs:
-             print("DEBUG: No hotels from LLM, fetching from Local DB...")
-             try:
-                 # Try to guess destination from summary or first day
-                 # This is tricky without explicit dest, but we can try to find a known city
-                 # Or better, pass destination to _parse_itinerary (requires signature change)
-                 # For now, let's look at the first activity location or summary
-                 
-                 # Better approach: We can't easily change signature safely across all calls right now
-                 # But we can access the global instance of local_db
-                 from .local_database import local_db
-                 
-                 # Heuristic: Try to find a city name in the summary
-                 # This is weak. Ideally, we should pass the destination.
-                 # Let's fallback to "Indore" if we detect it, or just leave it empty if we can't be sure.
-                 # Wait, 'generate' method has 'form.destinations'. 
-                 # We can inject 'meta_destination' into the data dict in 'generate' before calling parse?
-                 pass
-             except Exception as e:
-                 print(f"Hotel injection failed: {e}")
-
-
-        # Fallback: If no hotels from LLM, fetch from Local DB
-        if not hotel_recs:
-             dest = data.get("meta_destination")
-             if dest:
-                 print(f"DEBUG: No hotels from LLM, fetching for {dest}...")
-                 try:
-                     from .local_database import local_db
-                     # Try exact match or fuzzy
-                     db_hotels = local_db.get_hotels(dest)
-                     if not db_hotels:
-                         # Try finding official name
-                         status = local_db.get_city_status(dest)
-                         if status['found']:
-                             db_hotels = local_db.get_hotels(status['official_name'])
-                     
-                     for h in db_hotels[:3]:
-                         hotel_recs.append(HotelRecommendation(
-                             name=h.get('name'),
-                             rating=h.get('category', 'Standard'),
-                             location=f"{h.get('lat')}, {h.get('lon')}",
-                             description="Top rated local stay.",
-                             price_range="$$"
-                         ))
-                 except Exception as e:
-                     print(f"Hotel fallback failed: {e}")
-
-        for day_data in data.get("days", []):
-            activities = []
-            for act_data in day_data.get("activities", []):
-                location = act_data.get("location", "Unknown")
-                desc = act_data.get("description", "")
-                
-                # Aggressive Anti-Filler Logic: Skip 'Travel', 'Drive', or 'Hotel' blocks
-                loc_lower = location.lower()
-                desc_lower = desc.lower()
-                
-                # Check for Hotel/Check-in explicitly
-                is_hotel = any(x in loc_lower for x in ["check-in", "check in", "hotel", "resort", "stay at"]) or \
-                           any(x in desc_lower for x in ["check-in", "check in", "hotel stay", "checking in"])
-                
-                if is_hotel:
-                    print(f"DEBUG: Filtered out hotel activity: {location}")
-                    continue
-
-                is_filler = any(x in loc_lower for x in ["travel to", "drive to", "walking to", "transit"]) or \
-                            any(x in desc_lower for x in ["travel to", "drive to", "walking to", "heading to"])
-                
-                if is_filler and act_data.get("activity_type", "").lower() != "sightseeing":
-                     # Double check: if it's marked as sightseeing but says travel, it's filler
-                     continue
-                if is_filler:
-                    continue
-                
-                # Skip transit hubs as sightseeing
-                if "railway station" in loc_lower or "airport" in loc_lower or "bus stand" in loc_lower:
-                    if "explore" in desc_lower or "stroll" in desc_lower:
-                        continue
-
-                activity_type_str = act_data.get("activity_type", "sightseeing")
-                try:
-                    activity_type = ActivityType(activity_type_str.lower())
-                except ValueError:
-                    activity_type = ActivityType.SIGHTSEEING
-                
-                activities.append(Activity(
-                    time_slot=act_data.get("time_slot") or act_data.get("time") or "09:00 - 10:00",
-                    location=act_data.get("location", "Unknown"),
-                    activity_type=activity_type,
-                    description=act_data.get("description", ""),
-                    travel_distance_km=float(act_data.get("travel_distance_km", 0)),
-                    duration_minutes=int(act_data.get("duration_minutes", 60)),
-                    notes=act_data.get("notes")
-                ))
+    def _fetch_fallback_hotels(self, dest: str) -> list[HotelRecommendation]:
+        """Top Local DB hotels for the destination, used when the LLM returns none."""
+        hotel_recs = []
+        try:
+            from .local_database import local_db
+            # Try exact match or fuzzy
+            db_hotels = local_db.get_hotels(dest)
+            if not db_hotels:
+                # Try finding official name
+                status = local_db.get_city_status(dest)
+                if status['found']:
+                    db_hotels = local_db.get_hotels(status['official_name'])
             
-            day = DayPlan(
-                day_number=day_data.get("day_number", 1),
-                date=day_data.get("date", datetime.now().strftime("%Y-%m-%d")),
-                theme=day_data.get("theme"),
-                activities=activities,
-                total_distance_km=float(day_data.get("total_distance_km", 0)),
-                weather=day_data.get("weather")
-            )
-            day.calculate_total_distance()
-            days.append(day)
-        
-        return Itinerary(
-            summary=data.get("summary", "Travel itinerary"),
-            days=days,
-            hotel_recommendations=hotel_recs,
-            soft_preferences_applied=data.get("soft_preferences_applied", []),
-            soft_preferences_ignored=data.get("soft_preferences_ignored", []),
-            changes_made=data.get("changes_made", []),
-            change_summary=data.get("change_summary", ""),
-            suggestions=data.get("suggestions", []),
-            pro_tips=data.get("pro_tips", [])
-        )
+            for h in db_hotels[:3]:
+                hotel_recs.append(HotelRecommendation(
+                    name=h.get('name'),
+                    rating=h.get('category', 'Standard'),
+                    location=f"{h.get('lat')}, {h.get('lon')}",
+                    description="Top rated local stay.",
+                    price_range="$$"
+                ))
+        except Exception as e:
+            logger.warning("Hotel fallback failed: %s", e)
+        return hotel_recs
 
 
 # Global planner instance
@@ -1,7 +1,7 @@
 """
 Real LLM Client - Connects to OpenAI, Mistral, Ollama, or Hugging Face.
 """
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator
 import json
 import logging
 from openai import AsyncOpenAI
@@ -13,11 +13,28 @@ except ImportError:
     AsyncInferenceClient = None
 import re
 import ast
+from datetime import datetime
 
 from ..config import settings
+from .. import json_codec
+from .http_client import get_http_client
+from .debug_log import get_debug_logger
 
 logger = logging.getLogger(__name__)
 
+# JSON repair patterns (compiled once, used only when the direct parse fails)
+# Smart quotes and all dash variants (hyphen, non-breaking, en-dash, em-dash, etc.) to ASCII, in one pass
+_UNICODE_FIX = str.maketrans({
+    0x201c: '"', 0x201d: '"',
+    0x2018: "'", 0x2019: "'",
+    0x2010: '-', 0x2011: '-', 0x2012: '-', 0x2013: '-', 0x2014: '-', 0x2015: '-',
+})
+_FENCED_JSON_RE = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL)
+_TRAILING_COMMA_RE = re.compile(r",\s*([\]}])")
+# Structural tokens for truncation repair: escape pairs, quotes and brackets (everything else is skipped in C)
+_JSON_TOKEN_RE = re.compile(r'\\.|["{}\[\]]')
+
+
 class RealLLMClient:
     """
     Client for interacting with real LLMs via OpenAI-compatible API or native HF Client.
@@ -45,46 +62,123 @@ class RealLLMClient:
             # and HF Router uses custom IDs like 'openai/gpt-oss-20b:groq'
             pass
             
-        # Initialize OpenAI Compatible Client (Ollama, Mistral, OpenAI, Hugging Face)
-        self.client = AsyncOpenAI(
-            api_key=self.api_key if self.api_key else "dummy_key",
-            base_url=self.base_url if self.base_url else None
+        # OpenAI Compatible Client (Ollama, Mistral, OpenAI, Hugging Face), built lazily by `client`
+        self._client: Optional[AsyncOpenAI] = None
+        self._http_client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        """
+        OpenAI-compatible client on the shared connection pool, so LLM calls reuse keep-alive
+        connections. Rebuilt when the app has closed and replaced that pool (lifespan restart).
+        """
+        http_client = get_http_client()
+        if self._client is None or self._http_client is not http_client:
+            self._client = AsyncOpenAI(
+                api_key=self.api_key if self.api_key else "dummy_key",
+                base_url=self.base_url if self.base_url else None,
+                http_client=http_client
+            )
+            self._http_client = http_client
+        return self._client
+
+    def _supports_cache_control(self) -> bool:
+        """Whether the provider accepts Anthropic-style cache_control content blocks."""
+        return self.provider == "anthropic" or (
+            self.provider == "openrouter" and self.model.startswith("anthropic/")
         )
 
+    def _prepare_messages(self, messages: list[dict]) -> list[dict]:
+        """
+        Apply cache_control breakpoints set by callers.
+        Anthropic-style providers get the message as a cacheable content block; everyone else
+        gets the key stripped (OpenAI-compatible servers cache identical prefixes automatically).
+        Without an explicit breakpoint, Anthropic-style providers cache the first system message.
+        """
+        if not any("cache_control" in m for m in messages):
+            if not self._supports_cache_control():
+                return messages
+            messages = list(messages)
+            for i, m in enumerate(messages):
+                if m["role"] == "system":
+                    messages[i] = {**m, "cache_control": {"type": "ephemeral"}}
+                    break
+            else:
+                return messages
+        
+        prepared = []
+        for m in messages:
+            if "cache_control" not in m:
+                prepared.append(m)
+                continue
+            m = dict(m)
+            cache_control = m.pop("cache_control")
+            if self._supports_cache_control() and isinstance(m.get("content"), str):
+                m["content"] = [{"type": "text", "text": m["content"], "cache_control": cache_control}]
+            prepared.append(m)
+        return prepared
+
+    async def warm_up(self):
+        """Establish a pooled connection to the provider with a cheap models listing."""
+        try:
+            await self.client.models.list()
+        except Exception as e:
+            logger.debug(f"LLM warm-up request failed: {e}")
+
+    def _build_request(
+        self,
+        messages: list[dict],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        json_mode: bool,
+        schema: Optional[dict]
+    ) -> dict:
+        """Build the chat.completions.create kwargs for the configured provider."""
+        response_format = {"type": "json_object"} if json_mode else None
+        
+        kwargs = {
+            "model": self.model,
+            "messages": self._prepare_messages(messages),
+            "temperature": temperature,
+        }
+        
+        if max_tokens:
+            kwargs["max_tokens"] = max_tokens
+            
+        if json_mode and schema and self.provider == "vllm":
+            # vLLM guided decoding: the schema is enforced at sampling time
+            kwargs["extra_body"] = {"guided_json": schema}
+        elif json_mode and schema and self.provider == "openai":
+            kwargs["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "response", "schema": schema}
+            }
+        elif json_mode and self.provider != "huggingface":
+            kwargs["response_format"] = response_format
+            
+        # Explicit timeout to prevent early disconnects on slow generations
+        kwargs["timeout"] = 120.0
+        return kwargs
+
     async def chat(
         self,
         messages: list[dict],
         temperature: Optional[float] = 0.7,
         max_tokens: Optional[int] = None,
-        json_mode: bool = False
+        json_mode: bool = False,
+        schema: Optional[dict] = None
     ) -> str:
         """
         Process chat using the configured LLM provider.
+        If a JSON schema is given, it is enforced via guided decoding where the provider supports it.
         """
         try:
-            response_format = {"type": "json_object"} if json_mode else None
-            
-            kwargs = {
-                "model": self.model,
-                "messages": messages,
-                "temperature": temperature,
-            }
-            
-            if max_tokens:
-                kwargs["max_tokens"] = max_tokens
-                
-            if json_mode and self.provider != "huggingface":
-                kwargs["response_format"] = response_format
-                
-            # Explicit timeout to prevent early disconnects on slow generations
-            kwargs["timeout"] = 120.0
-
+            kwargs = self._build_request(messages, temperature, max_tokens, json_mode, schema)
             response = await self.client.chat.completions.create(**kwargs)
             return response.choices[0].message.content
             
         except Exception as e:
             logger.error(f"LLM Chat Error: {e}")
-            print(f"ERROR: LLM Chat Failed: {e}")
             # Fallback to a valid itinerary structure to inform the user
             # We assume this error might be a connection issue
             if "native client" in str(e).lower() or "connection" in str(e).lower() or "404" in str(e) or "401" in str(e):
@@ -95,11 +189,36 @@ class RealLLMClient:
             # But since chat() returns str, we return the error string.
             return f"Error communicating with AI: {str(e)}"
     
+    async def chat_stream(
+        self,
+        messages: list[dict],
+        temperature: Optional[float] = 0.7,
+        max_tokens: Optional[int] = None,
+        json_mode: bool = False,
+        schema: Optional[dict] = None,
+        stream_info: Optional[dict] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream the reply as text deltas, as the provider produces them.
+        If given, stream_info receives the final chunk's finish_reason ("length" when cut off at max_tokens).
+        """
+        kwargs = self._build_request(messages, temperature, max_tokens, json_mode, schema)
+        stream = await self.client.chat.completions.create(**kwargs, stream=True)
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if choice.finish_reason and stream_info is not None:
+                stream_info["finish_reason"] = choice.finish_reason
+            if choice.delta.content:
+                yield choice.delta.content
+
     async def chat_json(
         self,
         messages: list[dict],
         temperature: Optional[float] = 0.7,
-        max_tokens: Optional[int] = None
+        max_tokens: Optional[int] = None,
+        schema: Optional[dict] = None
     ) -> dict:
         """
         Process JSON request using the real LLM.
@@ -108,7 +227,7 @@ class RealLLMClient:
         if not any("json" in m.get("content", "").lower() for m in messages if m["role"] == "system"):
             messages[0]["content"] += "\n\nIMPORTANT: Return ONLY valid JSON."
             
-        response_text = await self.chat(messages, temperature, max_tokens, json_mode=True)
+        response_text = await self.chat(messages, temperature, max_tokens, json_mode=True, schema=schema)
         
         try:
             return self._repair_json(response_text)
@@ -116,18 +235,11 @@ class RealLLMClient:
 
         except Exception as e:
             logger.error(f"LLM Chat Error: {e}")
-            print(f"ERROR: LLM Chat Failed: {e}")
             
-            # Debug Log to file
-            try:
-                from datetime import datetime
-                import traceback
-                with open("llm_debug_error.log", "a") as f:
-                    f.write(f"\n\n--- ERROR {datetime.now()} ---\n")
-                    f.write(f"Exception: {str(e)}\n")
-                    f.write(traceback.format_exc())
-            except Exception as log_err:
-                print(f"Failed to write log: {log_err}")
+            # Debug Log to file (written in the background); the stack trace only when debugging
+            get_debug_logger("llm_debug_error.log").error(
+                f"\n\n--- ERROR {datetime.now()} ---\nException: {str(e)}", exc_info=logger.isEnabledFor(logging.DEBUG)
+            )
 
             # Fallback to a valid itinerary structure to inform the user
             return {
@@ -153,31 +265,37 @@ class RealLLMClient:
                 ]
             }
 
+    def parse_json(self, text: str) -> dict:
+        """
+        Parse a raw JSON reply (e.g. an accumulated stream) with the same repair steps as chat_json.
+        Raises if the text can't be repaired.
+        """
+        return self._repair_json(text)
+
     def _repair_json(self, text: str) -> dict:
         """
         Attempt to clean and parse JSON that might be malformed or wrapped in text.
         """
-        # Pre-cleaning: Normalize unicode characters using regex
-        # Replace smart quotes (double)
-        text = re.sub(r'[\u201c\u201d]', '"', text)
-        # Replace smart quotes (single)
-        text = re.sub(r"[\u2018\u2019]", "'", text)
-        # Replace all dash variants (hyphen, non-breaking, en-dash, em-dash, etc.)
-        text = re.sub(r'[\u2010-\u2015]', '-', text)
+        try:
+            # 0. Fast path: well-formed JSON (the common case) parses without any cleanup
+            return json_codec.loads(text)
+        except json.JSONDecodeError:
+            pass
+
+        # Pre-cleaning: Normalize unicode quotes and dashes
+        text = text.translate(_UNICODE_FIX)
         
         try:
             # 1. Try direct parse
-            return json.loads(text)
+            return json_codec.loads(text)
         except json.JSONDecodeError:
-            print("DEBUG: JSON Direct Parse failed, trying cleanup...")
-            pass
+            logger.debug("JSON Direct Parse failed, trying cleanup...")
 
         cleaned_text = text.strip()
 
         # 2. Extract JSON from Markdown code blocks
         if "```" in cleaned_text:
-            pattern = r"```(?:json)?\s*(\{.*?\})\s*```"
-            match = re.search(pattern, cleaned_text, re.DOTALL)
+            match = _FENCED_JSON_RE.search(cleaned_text)
             if match:
                 cleaned_text = match.group(1)
             else:
@@ -191,7 +309,7 @@ class RealLLMClient:
             cleaned_text = cleaned_text[start:end+1]
 
         try:
-            return json.loads(cleaned_text)
+            return json_codec.loads(cleaned_text)
         except json.JSONDecodeError:
             # 4. Try ast.literal_eval for Python-style dicts (single quotes)
             try:
@@ -203,26 +321,24 @@ class RealLLMClient:
             # This is risky but helps with some LLMs
             try:
                 # Remove trailing commas before matching brackets
-                fixed_text = re.sub(r",\s*([\]}])", r"\1", cleaned_text)
-                return json.loads(fixed_text)
+                fixed_text = _TRAILING_COMMA_RE.sub(r"\1", cleaned_text)
+                return json_codec.loads(fixed_text)
             except json.JSONDecodeError:
                 # 6. Truncation Repair: If it looks truncated, try to close it
                 try:
-                    print("DEBUG: Attempting Truncation Repair...")
+                    logger.debug("Attempting Truncation Repair...")
                     repaired = self._close_truncated_json(cleaned_text)
-                    result = json.loads(repaired)
-                    print("DEBUG: Truncation Repair SUCCESS!")
+                    result = json_codec.loads(repaired)
+                    logger.debug("Truncation Repair SUCCESS!")
                     return result
                 except Exception as e:
-                    print(f"DEBUG: Truncation Repair failed: {e}")
-                    pass
+                    logger.debug("Truncation Repair failed: %s", e)
 
                 # Include a snippet of the text in the error for debugging
-                # Log full bad JSON to file for inspection
-                with open("bad_json.log", "a") as f:
-                    f.write(f"\n\n--- FAILED PARSE ATTEMPT ---\n")
-                    f.write(f"RAW TEXT:\n{text}\n")
-                    f.write(f"CLEANED TEXT:\n{cleaned_text}\n")
+                # Log full bad JSON to file for inspection (written in the background)
+                get_debug_logger("bad_json.log").error(
+                    f"\n\n--- FAILED PARSE ATTEMPT ---\nRAW TEXT:\n{text}\nCLEANED TEXT:\n{cleaned_text}"
+                )
                 raise Exception(f"Failed to parse JSON (length: {len(text)}). Check bad_json.log for details.")
 
     def _close_truncated_json(self, text: str) -> str:
@@ -247,27 +363,21 @@ class RealLLMClient:
         if last_comma > last_brace:
             text = text[:last_comma]
         
-        # Now count brackets
+        # Now count brackets, visiting only structural tokens
         stack = []
         in_string = False
-        escaped = False
         
-        for char in text:
-            if char == '"' and not escaped:
+        for match in _JSON_TOKEN_RE.finditer(text):
+            token = match.group()
+            if token == '"':
                 in_string = not in_string
-            elif char == '\\' and in_string:
-                escaped = not escaped
+            elif in_string or len(token) > 1:
+                # Brackets inside strings and escaped characters don't count
                 continue
-            
-            if not in_string:
-                if char == '{': stack.append('}')
-                elif char == '[': stack.append(']')
-                elif char == '}': 
-                    if stack and stack[-1] == '}': stack.pop()
-                elif char == ']':
-                    if stack and stack[-1] == ']': stack.pop()
-            
-            escaped = False
+            elif token == '{': stack.append('}')
+            elif token == '[': stack.append(']')
+            elif stack and stack[-1] == token:
+                stack.pop()
             
         if in_string:
             text += '"'
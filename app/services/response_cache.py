@@ -0,0 +1,90 @@
+"""
+Response Cache - Bounded, expiring in-memory cache for expensive LLM round-trips.
+Identical requests (page refresh, retry, double submit) reuse the stored result.
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+from .. import json_codec
+
+
+class ResponseCache:
+    """
+    LRU cache keyed by a stable hash of the request inputs; entries expire after ttl seconds.
+    Concurrent identical requests share one in-flight computation (singleflight)
+    instead of all calling the LLM.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # key -> (expires_at, value); expires_at is None when there is no ttl
+        self._entries: OrderedDict[str, tuple[Optional[float], Any]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Build a stable cache key from JSON-serializable request inputs."""
+        payload = json_codec.dumps(parts, sort_keys=True, default=str)
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value (marking it recently used), or None if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any):
+        """Store a value, evicting the least recently used entries beyond maxsize."""
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: str):
+        """Drop a single entry."""
+        self._entries.pop(key, None)
+
+    def clear(self):
+        """Drop all entries."""
+        self._entries.clear()
+
+    async def get_or_create(
+        self,
+        key: str,
+        create: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]] = None
+    ) -> Any:
+        """
+        Read-through lookup: on a miss, run create() once for all concurrent callers
+        of the same key and cache its result (if cacheable() allows).
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._create(key, create, cacheable))
+            self._inflight[key] = task
+        # Shielded so one caller disconnecting doesn't cancel the others' shared work
+        return await asyncio.shield(task)
+
+    async def _create(self, key: str, create: Callable[[], Awaitable[Any]], cacheable: Optional[Callable[[Any], bool]]) -> Any:
+        """Run the shared computation, then cache the value and release the key."""
+        try:
+            value = await create()
+            if cacheable is None or cacheable(value):
+                self.set(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)